@@ -1,6 +1,8 @@
 from models_pg import db, User, Note, Payment
 from sqlalchemy import func
 
+from ai.groq import get_breaker_state
+
 
 def get_admin_stats():
 
@@ -20,5 +22,6 @@ def get_admin_stats():
         "pro_users": pro_users,
         "free_users": total_users - pro_users,
         "notes": total_notes,
-        "revenue": total_revenue
+        "revenue": total_revenue,
+        "ai_breaker": get_breaker_state()
     }
@@ -0,0 +1,263 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import has_app_context
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from ai.groq import is_error_reply, is_error_chunk
+from models_pg import db, LLMCacheEntry
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- SETTINGS ----------------
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_LOCAL_SIZE = int(os.getenv("LLM_CACHE_LOCAL_SIZE", "256"))
+LLM_CACHE_DB_MAX_ROWS = int(os.getenv("LLM_CACHE_DB_MAX_ROWS", "5000"))
+
+# Only near-deterministic generations are worth replaying
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+
+# Trim the shared table once every N stores per worker
+PRUNE_EVERY = 50
+
+
+def make_cache_key(prompt, model, temperature, max_tokens):
+    """
+    Content address for a completion request.
+    Whitespace differences in the prompt map to the same key; case is
+    kept, since pasted text like "CO" and "Co" means different things.
+    """
+    normalized = re.sub(r"\s+", " ", prompt).strip()
+    raw = f"{model}\n{temperature:.3f}\n{max_tokens}\n{normalized}"
+
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(temperature, history=None):
+    return LLM_CACHE_ENABLED and not history and temperature <= LLM_CACHE_MAX_TEMPERATURE
+
+
+# ---------------- IN-PROCESS LRU TIER ----------------
+class LRUCache:
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None:
+                return None
+
+            value, expires_at = item
+
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value, ttl=None):
+        """
+        Store value; returns how many entries were evicted.
+        """
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        evicted = 0
+
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                evicted += 1
+
+        return evicted
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ---------------- TWO-TIER RESPONSE CACHE ----------------
+class ResponseCache:
+
+    def __init__(self):
+        self.local = LRUCache(LLM_CACHE_LOCAL_SIZE, LLM_CACHE_TTL)
+        self._stats_lock = threading.Lock()
+        self._stores = 0
+        self.counters = {
+            "local_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0
+        }
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            data = dict(self.counters)
+
+        data["local_size"] = len(self.local)
+        return data
+
+    def get(self, key):
+        value = self.local.get(key)
+
+        if value is not None:
+            self._count("local_hits")
+            return value
+
+        value = self._db_get(key)
+
+        if value is not None:
+            self._count("db_hits")
+            self._count("evictions", self.local.put(key, value))
+            return value
+
+        self._count("misses")
+        return None
+
+    def peek(self, key):
+        """
+        Look a key up in both tiers without touching the hit/miss counters.
+        """
+        value = self.local.get(key)
+
+        if value is None:
+            value = self._db_get(key)
+
+        return value
+
+    def put(self, key, value, model):
+        if is_error_reply(value):
+            return
+
+        self._count("evictions", self.local.put(key, value))
+        self._count("stores")
+        self._db_put(key, value, model)
+
+    def wrap_stream(self, key, chunks, model):
+        """
+        Pass a token stream through and store the full text at the end.
+        A stream that failed part-way is never stored.
+        """
+        parts = []
+        failed = False
+
+        for chunk in chunks:
+            failed = failed or is_error_chunk(chunk)
+            parts.append(chunk)
+            yield chunk
+
+        if not failed:
+            self.put(key, "".join(parts), model)
+
+    # ----- POSTGRES TIER -----
+
+    def _db_get(self, key):
+        if not has_app_context():
+            return None
+
+        table = LLMCacheEntry.__table__
+
+        try:
+            with db.engine.begin() as conn:
+                row = conn.execute(
+                    table.update()
+                    .where(table.c.key == key)
+                    .where(table.c.expires_at > datetime.utcnow())
+                    .values(hits=table.c.hits + 1, last_used=datetime.utcnow())
+                    .returning(table.c.response)
+                ).first()
+        except Exception:
+            self._count("errors")
+            logger.exception("LLM cache read failed")
+            return None
+
+        return row[0] if row else None
+
+    def _db_put(self, key, value, model):
+        if not has_app_context():
+            return
+
+        table = LLMCacheEntry.__table__
+        now = datetime.utcnow()
+
+        stmt = insert(table).values(
+            key=key,
+            model=model,
+            response=value,
+            hits=0,
+            created=now,
+            last_used=now,
+            expires_at=now + timedelta(seconds=LLM_CACHE_TTL)
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={
+                "response": stmt.excluded.response,
+                "last_used": stmt.excluded.last_used,
+                "expires_at": stmt.excluded.expires_at
+            }
+        )
+
+        with self._stats_lock:
+            self._stores += 1
+            prune = self._stores % PRUNE_EVERY == 0
+
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(stmt)
+
+                if prune:
+                    self._db_prune(conn)
+        except Exception:
+            self._count("errors")
+            logger.exception("LLM cache write failed")
+
+    def _db_prune(self, conn):
+        table = LLMCacheEntry.__table__
+
+        conn.execute(table.delete().where(table.c.expires_at <= datetime.utcnow()))
+
+        # Size bound: keep only the most recently used rows
+        stale = (
+            select(table.c.key)
+            .order_by(table.c.last_used.desc())
+            .offset(LLM_CACHE_DB_MAX_ROWS)
+        )
+        result = conn.execute(table.delete().where(table.c.key.in_(stale)))
+
+        if result.rowcount:
+            self._count("evictions", result.rowcount)
+
+
+llm_cache = ResponseCache()
@@ -1,26 +1,197 @@
 import requests
 import os
+import json
+import threading
+import time
 
+from requests.adapters import HTTPAdapter
 
-def groq_generate(prompt, max_tokens=500, temperature=0.2, history=None):
-    api_key = os.getenv("GROQ_API_KEY")
+from ai.resilience import CircuitBreaker, backoff_delay, parse_retry_after
+from ai.ratelimit import rate_limiter
+from ai.prompting import compact_history, estimate_messages_tokens, HISTORY_TOKEN_LIMIT
+from ai.router import model_router, FAST_MODEL
+from ai.metrics import record_llm_call
 
-    if not api_key:
-        return "AI service is not configured. Contact administrator."
 
-    if not prompt or prompt.strip() == "":
-        return "No input provided."
+# Same variable the Groq SDK reads, so STT and chat follow one override
+# (e.g. the load-test stand-in in loadtest/standin.py)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com").rstrip("/")
+GROQ_API_URL = f"{GROQ_BASE_URL}/openai/v1/chat/completions"
+GROQ_MODEL = FAST_MODEL
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+TIMEOUT_REPLY = "AI service timeout. Please try again."
+BUSY_REPLY = "AI service is busy. Please try again shortly."
 
-    # ----- BUILD MESSAGES WITH MEMORY -----
-    messages = [
-        {
-            "role": "system",
-            "content": """
+# Replies groq_generate returns instead of model output
+ERROR_REPLIES = (
+    "AI service is not configured. Contact administrator.",
+    "No input provided.",
+    "AI daily free limit reached. Try again later.",
+    "Invalid AI API key configuration.",
+    TIMEOUT_REPLY,
+    BUSY_REPLY,
+    "Cannot connect to AI service.",
+    "AI service unavailable.",
+    "AI returned empty response."
+)
+
+
+# ---------------- RETRIES & CIRCUIT BREAKER ----------------
+
+GROQ_DEFAULT_DEADLINE = float(os.getenv("GROQ_DEFAULT_DEADLINE", "30"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_BACKOFF_BASE = float(os.getenv("GROQ_BACKOFF_BASE", "0.5"))
+GROQ_BACKOFF_CAP = float(os.getenv("GROQ_BACKOFF_CAP", "8"))
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Share of the remaining deadline a non-final model may use before
+# the router moves on to the next one
+PRIMARY_DEADLINE_SHARE = 0.6
+
+GROQ_BREAKER_THRESHOLD = int(os.getenv("GROQ_BREAKER_THRESHOLD", "5"))
+GROQ_BREAKER_COOLDOWN = float(os.getenv("GROQ_BREAKER_COOLDOWN", "30"))
+
+# One breaker per model, so a sick model does not block its fallback
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(model):
+    with _breakers_lock:
+        if model not in _breakers:
+            _breakers[model] = CircuitBreaker(
+                model,
+                failure_threshold=GROQ_BREAKER_THRESHOLD,
+                recovery_timeout=GROQ_BREAKER_COOLDOWN
+            )
+
+        return _breakers[model]
+
+
+def is_breaker_open(model):
+    return get_breaker(model).state == CircuitBreaker.OPEN
+
+
+def get_breaker_state():
+    """
+    Snapshot of the Groq circuit breakers for dashboards and health checks.
+    "state" is the worst state across models.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+
+    models = {b.name: b.snapshot() for b in breakers}
+    states = {snap["state"] for snap in models.values()}
+
+    if CircuitBreaker.OPEN in states:
+        state = CircuitBreaker.OPEN
+    elif CircuitBreaker.HALF_OPEN in states:
+        state = CircuitBreaker.HALF_OPEN
+    else:
+        state = CircuitBreaker.CLOSED
+
+    return {"state": state, "models": models}
+
+
+def _status_for(reply):
+    # Metrics label for an error reply
+    return {
+        TIMEOUT_REPLY: "timeout",
+        BUSY_REPLY: "busy",
+        "AI daily free limit reached. Try again later.": "rate_limited",
+        "Invalid AI API key configuration.": "auth",
+        "Cannot connect to AI service.": "connection"
+    }.get(reply, "error")
+
+
+def is_error_reply(text):
+    """
+    True when text is one of groq_generate's fallback messages.
+    """
+    if not text:
+        return True
+
+    return text in ERROR_REPLIES or text.startswith("AI error:")
+
+
+class ErrorChunk(str):
+    """
+    A streamed chunk carrying an error reply instead of model output.
+    It still reads as text, so clients show it like any other chunk.
+    """
+
+
+def is_error_chunk(chunk):
+    """
+    True when a streamed chunk reports a failed or cut-off generation.
+    """
+    return isinstance(chunk, ErrorChunk)
+
+
+# ---------------- CONNECTION POOL ----------------
+# One keep-alive session per worker process, shared by every thread.
+# urllib3 pools are thread-safe, but sockets must never cross a fork,
+# so the session is rebuilt whenever the pid changes.
+
+GROQ_POOL_CONNECTIONS = int(os.getenv("GROQ_POOL_CONNECTIONS", "4"))
+GROQ_POOL_MAXSIZE = int(os.getenv("GROQ_POOL_MAXSIZE", "16"))
+GROQ_POOL_BLOCK = os.getenv("GROQ_POOL_BLOCK", "false").lower() == "true"
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    adapter = HTTPAdapter(
+        pool_connections=GROQ_POOL_CONNECTIONS,
+        pool_maxsize=GROQ_POOL_MAXSIZE,
+        pool_block=GROQ_POOL_BLOCK,
+        max_retries=0
+    )
+
+    http = requests.Session()
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    http.headers.update({"Connection": "keep-alive"})
+
+    return http
+
+
+def get_http_session():
+    """
+    Return the process-wide pooled session for Groq calls.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            _session = _build_session()
+            _session_pid = pid
+
+    return _session
+
+
+def _reset_after_fork():
+    # Drop the parent's sockets without closing them from the child
+    global _session, _session_pid, _session_lock
+    _session = None
+    _session_pid = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+SYSTEM_PROMPT = """
 You are a friendly, patient, human-like AI Tutor.
 
 Behavior Rules:
@@ -33,12 +204,299 @@ Behavior Rules:
 - Explain in simple language
 - Never act robotic
 """
+
+
+def request_cost(prompt, max_tokens):
+    """
+    Tokens groq_generate charges the rate limiter for one call without history.
+    """
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+    return estimate_messages_tokens(messages) + max_tokens
+
+
+def _single(text):
+    # Streaming callers always get an iterator, even for error messages
+    yield ErrorChunk(text)
+
+
+def _post_with_retries(headers, payload, deadline_at, fail_fast=False, stream=False):
+    """
+    POST to Groq for payload["model"], retrying transient failures
+    until deadline_at. With fail_fast the first transient failure is
+    returned at once so the caller can try a fallback model.
+
+    Returns (response, None, False) for HTTP 200, otherwise
+    (None, error reply, fallback_worthy).
+    """
+    model = payload["model"]
+    breaker = get_breaker(model)
+    attempt = 0
+
+    # Request size for the tokens-per-minute bucket
+    cost = estimate_messages_tokens(payload["messages"]) + payload["max_tokens"]
+
+    while True:
+        if breaker.state == CircuitBreaker.OPEN:
+            return None, BUSY_REPLY, True
+
+        # Queue behind other workers instead of firing into a 429;
+        # when a fallback exists, move on rather than queue
+        queue_for = 0 if fail_fast else deadline_at - time.monotonic()
+
+        if not rate_limiter.acquire(model, cost, queue_for):
+            return None, BUSY_REPLY, True
+
+        remaining = deadline_at - time.monotonic()
+
+        if remaining <= 0:
+            return None, TIMEOUT_REPLY, True
+
+        if fail_fast:
+            remaining *= PRIMARY_DEADLINE_SHARE
+
+        if not breaker.allow():
+            return None, BUSY_REPLY, True
+
+        retry_after = None
+        started = time.monotonic()
+        settled = False
+
+        try:
+            response = get_http_session().post(
+                GROQ_API_URL,
+                headers=headers,
+                json=payload,
+                timeout=(min(GROQ_CONNECT_TIMEOUT, remaining), remaining),
+                stream=stream
+            )
+
+        except requests.exceptions.Timeout:
+            breaker.record_failure()
+            settled = True
+            error = TIMEOUT_REPLY
+
+        except requests.exceptions.ConnectionError:
+            breaker.record_failure()
+            settled = True
+            error = "Cannot connect to AI service."
+
+        else:
+            status = response.status_code
+
+            if status == 200:
+                breaker.record_success()
+                settled = True
+                model_router.observe(model, time.monotonic() - started)
+                return response, None, False
+
+            response.close()
+
+            if status not in RETRYABLE_STATUSES:
+                # Upstream answered; the request itself is the problem
+                breaker.record_success()
+                settled = True
+
+                if status == 401:
+                    return None, "Invalid AI API key configuration.", False
+
+                return None, f"AI error: {status}", False
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+            if status == 429:
+                breaker.record_failure(cooldown=retry_after)
+                model_router.mark_rate_limited(model, retry_after)
+                error = "AI daily free limit reached. Try again later."
+            else:
+                breaker.record_failure()
+                error = f"AI error: {status}"
+
+            settled = True
+
+        finally:
+            # Any other exit must not keep a half-open trial slot forever
+            if not settled:
+                breaker.release()
+
+        if fail_fast or attempt >= GROQ_MAX_RETRIES:
+            return None, error, True
+
+        delay = retry_after if retry_after is not None else backoff_delay(
+            attempt, GROQ_BACKOFF_BASE, GROQ_BACKOFF_CAP
+        )
+
+        # Waiting past the deadline is pointless; give up now
+        if time.monotonic() + delay >= deadline_at:
+            return None, error, True
+
+        time.sleep(delay)
+        attempt += 1
+
+
+def _post_with_fallback(headers, payload, deadline, models, stream=False):
+    """
+    Try each candidate model in order within one overall deadline.
+    Returns (response, None) or (None, error reply).
+    """
+    deadline_at = time.monotonic() + deadline
+    error = BUSY_REPLY
+
+    for index, model in enumerate(models):
+        payload["model"] = model
+        last = index == len(models) - 1
+
+        response, error, fallback = _post_with_retries(
+            headers, payload, deadline_at, fail_fast=not last, stream=stream
+        )
+
+        if response is not None:
+            return response, None
+
+        if not fallback:
+            break
+
+    return None, error
+
+
+def _stream_completion(headers, payload, deadline, models, call_site):
+    """
+    Yield content deltas from a Groq server-sent event stream.
+    """
+    started = time.monotonic()
+    status = "error"
+    ttft = None
+    usage = None
+
+    try:
+        response, error = _post_with_fallback(headers, payload, deadline, models, stream=True)
+
+        if error:
+            status = _status_for(error)
+            yield ErrorChunk(error)
+            return
+
+        breaker = get_breaker(payload["model"])
+
+        try:
+            with response:
+                # SSE is always UTF-8; requests would guess ISO-8859-1 from
+                # the bare content type and garble Hindi and Kannada
+                response.encoding = "utf-8"
+
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+
+                    data = line[len("data:"):].strip()
+
+                    if data == "[DONE]":
+                        break
+
+                    try:
+                        event = json.loads(data)
+                    except ValueError:
+                        continue
+
+                    # Usage arrives on the final chunk
+                    usage = event.get("usage") or event.get("x_groq", {}).get("usage") or usage
+
+                    choices = event.get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+
+                    if delta:
+                        if ttft is None:
+                            ttft = time.monotonic() - started
+
+                        yield delta
+
+            status = "ok"
+
+        except requests.exceptions.Timeout:
+            breaker.record_failure()
+            status = "timeout"
+            yield ErrorChunk(TIMEOUT_REPLY)
+
+        except requests.exceptions.ConnectionError:
+            breaker.record_failure()
+            status = "connection"
+            yield ErrorChunk("Cannot connect to AI service.")
+
+        except GeneratorExit:
+            # Client went away mid-stream
+            status = "cancelled"
+            raise
+
+        except Exception:
+            yield ErrorChunk("AI service unavailable.")
+
+    finally:
+        record_llm_call(
+            call_site,
+            payload["model"],
+            status,
+            time.monotonic() - started,
+            ttft=ttft,
+            usage=usage
+        )
+
+
+def groq_generate(
+    prompt,
+    max_tokens=500,
+    temperature=0.2,
+    history=None,
+    stream=False,
+    deadline=None,
+    call_site="default",
+    plan="free",
+    model=None
+):
+    """
+    Run a chat completion against Groq.
+
+    With stream=True an iterator of text chunks is returned instead of
+    the full string; errors arrive as an ErrorChunk, either alone or
+    after a partial answer when the stream breaks off.
+    deadline bounds the whole call, retries included, in seconds.
+    call_site and plan pick the model route (see ai/router.py) unless
+    an explicit model is given.
+    """
+    api_key = os.getenv("GROQ_API_KEY")
+
+    if not api_key:
+        message = "AI service is not configured. Contact administrator."
+        return _single(message) if stream else message
+
+    if not prompt or prompt.strip() == "":
+        return _single("No input provided.") if stream else "No input provided."
+
+    if deadline is None:
+        deadline = GROQ_DEFAULT_DEADLINE
+
+    if model:
+        models = [model]
+    else:
+        models = model_router.candidates(call_site, plan, is_open=is_breaker_open)
+
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    # ----- BUILD MESSAGES WITH MEMORY -----
+    messages = [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
         }
     ]
 
-    # Add conversation history if available
+    # Add conversation history if available, newest turns within the cap
     if history:
-        messages.extend(history)
+        messages.extend(compact_history(history, HISTORY_TOKEN_LIMIT))
 
     # Add current user question
     messages.append({
@@ -48,38 +506,44 @@ Behavior Rules:
 
     # ----- FINAL API PAYLOAD -----
     payload = {
-        "model": "llama-3.1-8b-instant",
+        "model": models[0],
         "messages": messages,
         "temperature": temperature,
         "max_tokens": max_tokens
     }
 
-    try:
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+    if stream:
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        return _stream_completion(headers, payload, deadline, models, call_site)
 
-        if response.status_code == 429:
-            return "AI daily free limit reached. Try again later."
+    started = time.monotonic()
+    status = "error"
+    usage = None
 
-        if response.status_code == 401:
-            return "Invalid AI API key configuration."
+    try:
+        response, error = _post_with_fallback(headers, payload, deadline, models)
 
-        if response.status_code != 200:
-            return f"AI error: {response.status_code}"
+        if error:
+            status = _status_for(error)
+            return error
 
         data = response.json()
+        usage = data.get("usage")
+        status = "ok"
 
         return data.get("choices", [{}])[0].get("message", {}).get("content", "AI returned empty response.")
 
     except requests.exceptions.Timeout:
-        return "AI service timeout. Please try again."
+        status = "timeout"
+        return TIMEOUT_REPLY
 
     except requests.exceptions.ConnectionError:
+        status = "connection"
         return "Cannot connect to AI service."
 
     except Exception as e:
         return "AI service unavailable."
+
+    finally:
+        record_llm_call(call_site, payload["model"], status, time.monotonic() - started, usage=usage)
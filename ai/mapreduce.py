@@ -0,0 +1,309 @@
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+from ai.groq import (
+    groq_generate, is_error_reply, request_cost,
+    ErrorChunk, BUSY_REPLY, TIMEOUT_REPLY, GROQ_DEFAULT_DEADLINE
+)
+from ai.prompting import estimate_tokens
+from ai.ratelimit import admission_seconds, get_limits
+from ai.router import model_router
+
+
+# ---------------- SETTINGS ----------------
+# Pasted lessons above PASTE_CHUNK_TOKENS are split into parts, noted in
+# parallel (map) and merged in one final call (reduce).
+
+PASTE_CHUNK_TOKENS = int(os.getenv("PASTE_CHUNK_TOKENS", "1800"))
+PASTE_MAX_CHUNKS = int(os.getenv("PASTE_MAX_CHUNKS", "8"))
+PASTE_MAP_WORKERS = int(os.getenv("PASTE_MAP_WORKERS", "4"))
+
+REDUCE_MAX_TOKENS = 1600
+
+# Share of the caller's deadline the map phase may use
+MAP_DEADLINE_SHARE = 0.55
+
+# Typical run time of one map call once the rate limiter has admitted it
+MAP_CALL_SECONDS = 10
+
+
+# ---------------- SPLITTING ----------------
+
+SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+NUMBERED_HEADING = re.compile(r"^\d+(\.\d+)*[.)]?\s+\S")
+NAMED_HEADING = re.compile(r"^(chapter|unit|lesson|section|part|topic)\b", re.I)
+
+
+def is_heading(line):
+    line = line.strip()
+
+    if not line or len(line) > 90 or line.endswith((".", "?", "!")):
+        return False
+
+    return (
+        line.startswith("#")
+        or line.endswith(":")
+        or line.isupper()
+        or bool(NAMED_HEADING.match(line))
+        or bool(NUMBERED_HEADING.match(line))
+    )
+
+
+def _sections(text):
+    """
+    Split text into sections, each starting at a heading line.
+    """
+    sections, current = [], []
+
+    for line in text.splitlines():
+        if is_heading(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current).strip())
+            current = []
+
+        current.append(line)
+
+    if any(l.strip() for l in current):
+        sections.append("\n".join(current).strip())
+
+    return sections
+
+
+def _pack(units, budget, joiner):
+    # Greedily join consecutive units while they fit in the budget
+    chunks, current, used = [], [], 0
+
+    for unit in units:
+        cost = estimate_tokens(unit)
+
+        if current and used + cost > budget:
+            chunks.append(joiner.join(current))
+            current, used = [], 0
+
+        current.append(unit)
+        used += cost
+
+    if current:
+        chunks.append(joiner.join(current))
+
+    return chunks
+
+
+def _split_oversized(section, budget):
+    # Paragraphs first, then sentences, then a hard cut as a last resort
+    pieces = []
+
+    for paragraph in re.split(r"\n\s*\n", section):
+        if estimate_tokens(paragraph) <= budget:
+            pieces.append(paragraph)
+            continue
+
+        for sentence in SENTENCE_END.split(paragraph):
+            if estimate_tokens(sentence) <= budget:
+                pieces.append(sentence)
+                continue
+
+            step = budget * 2
+            pieces.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+
+    return _pack(pieces, budget, "\n\n")
+
+
+def split_lesson(text, budget=PASTE_CHUNK_TOKENS):
+    """
+    Split pasted text into ordered chunks of at most ~`budget` tokens,
+    breaking at headings and paragraphs before anything else.
+    """
+    budget = max(budget, estimate_tokens(text) // PASTE_MAX_CHUNKS + 1)
+    sections = _sections(text)
+
+    while True:
+        pieces = []
+
+        for section in sections:
+            if estimate_tokens(section) <= budget:
+                pieces.append(section)
+            else:
+                pieces.extend(_split_oversized(section, budget))
+
+        chunks = _pack(pieces, budget, "\n\n")
+
+        # Packing leaves slack at section breaks; grow parts to stay under the cap
+        if len(chunks) <= PASTE_MAX_CHUNKS:
+            return chunks
+
+        budget = int(budget * 1.25) + 1
+
+
+def needs_map_reduce(text):
+    return estimate_tokens(text) > PASTE_CHUNK_TOKENS
+
+
+# ---------------- PROMPTS ----------------
+
+def map_prompt(chunk, mode, index, total, preamble):
+    # Imported here: ai.notes imports this module
+    from ai.notes import paste_base_instruction, paste_output_format
+
+    output_format, temperature, max_tokens = paste_output_format(mode)
+
+    prompt = paste_base_instruction(chunk) + f"""
+THIS IS PART {index} OF {total} OF A LONGER LESSON.
+- Write notes for THIS PART ONLY; all parts are merged afterwards.
+- Skip sections of the format this part has nothing for.
+""" + output_format
+
+    return f"{preamble}\n{prompt}", temperature
+
+
+def reduce_prompt(partials, mode, preamble):
+    from ai.notes import paste_output_format
+
+    output_format, temperature, max_tokens = paste_output_format(mode)
+
+    parts = "\n\n".join(
+        f"=== PART {index} ===\n{text.strip()}"
+        for index, text in enumerate(partials, start=1)
+    )
+
+    prompt = f"""
+You are merging partial notes made from consecutive parts of ONE pasted lesson.
+
+STRICT RULES:
+- Use ONLY the partial notes below. Do not introduce outside information.
+- Produce ONE set of notes in the exact output format below, every section in the given order.
+- Inside each section keep points in part order (PART 1 first), preserving the lesson's topic order.
+- Merge duplicate points; use one TITLE for the whole lesson.
+
+PARTIAL NOTES:
+{parts}
+""" + output_format
+
+    return f"{preamble}\n{prompt}", temperature
+
+
+# ---------------- PIPELINE ----------------
+
+def _map_prompts(chunks, mode, preamble, max_tokens):
+    total = len(chunks)
+
+    prompts = [
+        map_prompt(chunk, mode, index, total, preamble)
+        for index, chunk in enumerate(chunks, start=1)
+    ]
+    return prompts, [request_cost(prompt, max_tokens) for prompt, _ in prompts]
+
+
+def map_seconds(model, costs):
+    """
+    Least time the map phase takes: the rate limiter admitting every
+    call from a full bucket, then the last call running.
+    """
+    return admission_seconds(model, sum(costs)) + MAP_CALL_SECONDS
+
+
+def map_reduce_deadline(pasted_text, mode, preamble, max_tokens, plan="free", call_site="notes.paste"):
+    """
+    Least deadline map_reduce_notes needs for this paste under the
+    configured rate limits.
+    """
+    _, costs = _map_prompts(split_lesson(pasted_text), mode, preamble, max_tokens)
+    model = model_router.primary(f"{call_site}.map", plan)
+
+    return map_seconds(model, costs) / MAP_DEADLINE_SHARE
+
+
+def _map(chunks, mode, preamble, max_tokens, plan, deadline, call_site):
+    """
+    Note every chunk in parallel. Returns (partials, error reply or None).
+    """
+    app = current_app._get_current_object() if has_app_context() else None
+    total = len(chunks)
+    deadline_at = time.monotonic() + (deadline or GROQ_DEFAULT_DEADLINE)
+
+    prompts, costs = _map_prompts(chunks, mode, preamble, max_tokens)
+    model = model_router.primary(f"{call_site}.map", plan)
+
+    # Each call waits its turn in the rate limiter. A phase the bucket
+    # cannot admit before the deadline fails now, before spending tokens
+    # on parts that would be thrown away.
+    if map_seconds(model, costs) > deadline_at - time.monotonic():
+        return [], BUSY_REPLY
+
+    # Keep at most one bucket's worth of tokens in flight upstream
+    _, tpm = get_limits(model)
+    workers = max(1, min(PASTE_MAP_WORKERS, total, int(tpm // max(costs))))
+
+    def run(item):
+        prompt, temperature = item
+        remaining = deadline_at - time.monotonic()
+
+        if remaining <= 0:
+            return TIMEOUT_REPLY
+
+        def call():
+            return groq_generate(
+                prompt=prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                deadline=remaining,
+                call_site=f"{call_site}.map",
+                plan=plan
+            )
+
+        if app is None:
+            return call()
+
+        with app.app_context():
+            return call()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        partials = list(pool.map(run, prompts))
+
+    for partial in partials:
+        if is_error_reply(partial):
+            return partials, partial
+
+    return partials, None
+
+
+def map_reduce_notes(pasted_text, mode, preamble, max_tokens, plan="free",
+                     stream=False, deadline=None, call_site="notes.paste"):
+    """
+    Notes for a long pasted lesson: chunk, note the chunks concurrently,
+    then merge them in one pass. Same return shape as groq_generate.
+    """
+    started = time.monotonic()
+    chunks = split_lesson(pasted_text)
+
+    def run_reduce(reduce_stream):
+        map_deadline = deadline * MAP_DEADLINE_SHARE if deadline else None
+        partials, error = _map(chunks, mode, preamble, max_tokens, plan, map_deadline, call_site)
+
+        if error:
+            return iter([ErrorChunk(error)]) if reduce_stream else error
+
+        prompt, temperature = reduce_prompt(partials, mode, preamble)
+        remaining = max(5.0, deadline - (time.monotonic() - started)) if deadline else None
+
+        return groq_generate(
+            prompt=prompt,
+            max_tokens=min(REDUCE_MAX_TOKENS, max_tokens * 2),
+            temperature=temperature,
+            stream=reduce_stream,
+            deadline=remaining,
+            call_site=f"{call_site}.reduce",
+            plan=plan
+        )
+
+    if not stream:
+        return run_reduce(False)
+
+    # Defer the map phase until the response is actually iterated
+    def generate():
+        yield from run_reduce(True)
+
+    return generate()
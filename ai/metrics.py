@@ -0,0 +1,327 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- PROMETHEUS-FORMAT METRICS ----------------
+# Small in-process registry rendered in the Prometheus text format.
+# Each gunicorn worker keeps its own values. With METRICS_DIR set (see
+# gunicorn.conf.py) workers also write them to that directory, and a
+# scrape answered by any worker returns the sum over all of them.
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+
+# How often each worker refreshes its snapshot in METRICS_DIR
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 21, 34, 60)
+WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+
+    if not pairs:
+        return ""
+
+    body = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            samples = [
+                (f"{self.name}{_format_labels(self.labels, key)}", value)
+                for key, value in sorted(self._values.items())
+            ]
+
+        return _family(self.name, self.help_text, "counter", samples)
+
+
+class Histogram:
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [cumulative bucket counts..., count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+
+        with self._lock:
+            row = self._values.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[index] += 1
+
+            row[-2] += 1
+            row[-1] += value
+
+    def collect(self):
+        samples = []
+
+        with self._lock:
+            for key, row in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, row):
+                    samples.append((f"{self.name}_bucket{_format_labels(self.labels, key, [('le', bound)])}", count))
+
+                samples.append((f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])}", row[-2]))
+                samples.append((f"{self.name}_count{_format_labels(self.labels, key)}", row[-2]))
+                samples.append((f"{self.name}_sum{_format_labels(self.labels, key)}", row[-1]))
+
+        return _family(self.name, self.help_text, "histogram", samples)
+
+
+def _family(name, help_text, kind, samples, merge="sum"):
+    # merge: how workers' values for one series combine ("sum" or "max")
+    return {
+        "name": name,
+        "help": help_text,
+        "type": kind,
+        "merge": merge,
+        "samples": [[series, value] for series, value in samples]
+    }
+
+
+def gauge_family(name, help_text, samples, kind="gauge", merge="sum"):
+    """
+    Point-in-time values: samples is [(labels dict, value), ...].
+    """
+    return _family(name, help_text, kind, [
+        (f"{name}{_format_labels(labels.keys(), labels.values())}", value)
+        for labels, value in samples
+    ], merge)
+
+
+# ---------------- REGISTRY ----------------
+
+_metrics = []
+_collectors = []
+
+
+def register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(fn):
+    """
+    fn() returns a list of gauge_family() values, computed at scrape time.
+    """
+    _collectors.append(fn)
+    return fn
+
+
+def collect_metrics():
+    families = [metric.collect() for metric in _metrics]
+
+    for collector in _collectors:
+        families.extend(collector())
+
+    return families
+
+
+def render_metrics():
+    families = collect_metrics()
+
+    if METRICS_DIR:
+        write_snapshot(families)
+        families = _merge_snapshots()
+
+    lines = []
+
+    for family in families:
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        lines.extend(f"{series} {value}" for series, value in family["samples"])
+
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- SHARED ACROSS WORKERS ----------------
+
+def write_snapshot(families=None):
+    """
+    Store this worker's values for scrapes answered by other workers.
+    """
+    if not METRICS_DIR:
+        return
+
+    if families is None:
+        families = collect_metrics()
+
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+
+        # Write then rename so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=METRICS_DIR, suffix=".part")
+
+        with os.fdopen(fd, "w") as file:
+            json.dump(families, file)
+
+        os.replace(temp_path, os.path.join(METRICS_DIR, f"{os.getpid()}.json"))
+
+    except OSError:
+        logger.exception("Metrics snapshot write failed")
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+
+    return True
+
+
+def _merge_snapshots():
+    merged = {}
+
+    try:
+        names = sorted(os.listdir(METRICS_DIR))
+    except OSError:
+        names = []
+
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+
+        try:
+            pid = int(name[:-len(".json")])
+
+            with open(os.path.join(METRICS_DIR, name)) as file:
+                families = json.load(file)
+        except (OSError, ValueError):
+            continue
+
+        running = _is_running(pid)
+
+        for family in families:
+            # Counts of recycled workers still add up; their gauges do not
+            if family["type"] == "gauge" and not running:
+                continue
+
+            target = merged.setdefault(family["name"], dict(family, samples={}))
+            samples = target["samples"]
+
+            for series, value in family["samples"]:
+                if series not in samples:
+                    samples[series] = value
+                elif family["merge"] == "max":
+                    samples[series] = max(samples[series], value)
+                else:
+                    samples[series] += value
+
+    for family in merged.values():
+        family["samples"] = list(family["samples"].items())
+
+    return list(merged.values())
+
+
+_flusher_pid = None
+
+
+def start_flusher():
+    """
+    Refresh this worker's snapshot in the background, so the numbers
+    of idle workers stay current. Called once per worker after fork.
+    """
+    global _flusher_pid
+
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+
+    _flusher_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+
+            try:
+                write_snapshot()
+            except Exception:
+                logger.exception("Metrics snapshot failed")
+
+    threading.Thread(target=run, name="metrics-flush", daemon=True).start()
+
+
+# ---------------- LLM CALL METRICS ----------------
+
+llm_requests = register(Counter(
+    "llm_requests_total",
+    "LLM calls by call site, model and outcome.",
+    ("call_site", "model", "status")
+))
+
+llm_latency = register(Histogram(
+    "llm_request_duration_seconds",
+    "Wall time of LLM calls, retries included.",
+    ("call_site", "model", "status")
+))
+
+llm_ttft = register(Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time until the first streamed token arrived.",
+    ("call_site", "model")
+))
+
+llm_prompt_tokens = register(Counter(
+    "llm_prompt_tokens_total",
+    "Prompt tokens reported by the upstream usage field.",
+    ("call_site", "model")
+))
+
+llm_completion_tokens = register(Counter(
+    "llm_completion_tokens_total",
+    "Completion tokens reported by the upstream usage field.",
+    ("call_site", "model")
+))
+
+ratelimit_wait = register(Histogram(
+    "llm_ratelimit_wait_seconds",
+    "Time calls spent queued on the shared rate limiter.",
+    ("model", "outcome"),
+    buckets=WAIT_BUCKETS
+))
+
+
+def record_llm_call(call_site, model, status, seconds, ttft=None, usage=None):
+    llm_requests.inc(call_site=call_site, model=model, status=status)
+    llm_latency.observe(seconds, call_site=call_site, model=model, status=status)
+
+    if ttft is not None:
+        llm_ttft.observe(ttft, call_site=call_site, model=model)
+
+    if usage:
+        llm_prompt_tokens.inc(usage.get("prompt_tokens", 0), call_site=call_site, model=model)
+        llm_completion_tokens.inc(usage.get("completion_tokens", 0), call_site=call_site, model=model)
@@ -1,4 +1,9 @@
-from ai.groq import groq_generate
+from ai.groq import groq_generate, ErrorChunk
+from ai.router import model_router
+from ai.cache import llm_cache, make_cache_key, is_cacheable
+from ai.prompting import compact_history, estimate_tokens, input_budget
+from ai.singleflight import singleflight
+from ai.mapreduce import map_reduce_notes, map_reduce_deadline, needs_map_reduce
 
 
 # ===================== CHANGE A: SYLLABUS_BLOCK (prepended to every prompt) =====================
@@ -59,10 +64,8 @@ def is_poem_topic(text: str) -> bool:
 
 
 # ---------- NEW FUNCTION FOR PASTED LESSON MODE ----------
-def build_paste_prompt(pasted_text: str, mode: str) -> tuple[str, float, int]:
-    mode = mode.lower()
-
-    base_instruction = f"""
+def paste_base_instruction(pasted_text: str) -> str:
+    return f"""
 User has pasted study material.
 
 TASK:
@@ -78,8 +81,15 @@ TEXT TO CONVERT:
 
 """
 
+
+def paste_output_format(mode: str) -> tuple[str, float, int]:
+    """
+    Output format block, temperature and max_tokens for a pasted-text mode.
+    """
+    mode = mode.lower()
+
     if mode == "board":
-        return base_instruction + """
+        return """
 OUTPUT FORMAT (STRICT):
 TITLE:
 1) Key Concepts (preserve text order)
@@ -91,7 +101,7 @@ TITLE:
 """, 0.16, 450
 
     if mode == "college":
-        return base_instruction + """
+        return """
 OUTPUT FORMAT (STRICT):
 TITLE:
 1) Key Concepts (preserve text order)
@@ -104,7 +114,7 @@ TITLE:
 
     # ===================== CHANGE C/E: English prose in pasted-text mode =====================
     if mode == "english":
-        return base_instruction + """
+        return """
 OUTPUT FORMAT (STRICT - PROSE CHAPTER):
 TITLE:
 AUTHOR:
@@ -119,7 +129,7 @@ EXAM QUESTIONS:
     # =================== END CHANGE C/E ===================
 
     if mode == "short":
-        return base_instruction + """
+        return """
 FORMAT REQUIRED:
 
 ULTRA SHORT NOTES:
@@ -131,7 +141,7 @@ ULTRA SHORT NOTES:
 """, 0.12, 350
 
     if mode == "mcq":
-        return base_instruction + """
+        return """
 Create MCQs directly from the given text.
 
 STRICT RULES:
@@ -151,6 +161,11 @@ Answer:
     raise ValueError("Invalid mode selected")
 
 
+def build_paste_prompt(pasted_text: str, mode: str) -> tuple[str, float, int]:
+    output_format, temperature, max_tokens = paste_output_format(mode)
+    return paste_base_instruction(pasted_text) + output_format, temperature, max_tokens
+
+
 # ---------- EXISTING TOPIC MODE PROMPT ----------
 def build_prompt(lesson: str, mode: str) -> tuple[str, float, int]:
     mode = mode.lower()
@@ -297,6 +312,28 @@ STUDENT INPUT:
 
 
 # ---------------- MAIN GENERATOR FUNCTION (MODIFIED) -----------------
+def paste_deadline(lesson: str, mode: str, user_prompt: str, plan: str = "free"):
+    """
+    Least deadline generate_notes_with_groq needs for a long pasted lesson
+    under the rate limits, or None when the request is a single call.
+    """
+    mode = (mode or "").lower()
+
+    if mode == "tutor" or not lesson or not lesson.strip() or is_poem_topic(lesson):
+        return None
+
+    if not user_prompt or len(user_prompt.strip()) <= 80 or not needs_map_reduce(user_prompt):
+        return None
+
+    try:
+        _, _, max_tokens = paste_output_format(mode)
+    except ValueError:
+        return None
+
+    max_tokens = min(max_tokens, 320 if plan == "free" else 800)
+    return map_reduce_deadline(user_prompt, mode, SYLLABUS_BLOCK, max_tokens, plan=plan)
+
+
 def generate_notes_with_groq(
     lesson: str,
     mode: str = "board",
@@ -305,10 +342,20 @@ def generate_notes_with_groq(
     history=None,
     board: str = "",
     class_level: str = "",
-    subject: str = ""
+    subject: str = "",
+    stream: bool = False,
+    deadline: float = None,
+    call_site: str = None
 ):
+    def reply(text):
+        return iter([text]) if stream else text
+
+    # Streaming callers must not save or charge for a rejected request
+    def rejected(text):
+        return iter([ErrorChunk(text)]) if stream else text
+
     if not lesson or lesson.strip() == "":
-        return "Please enter a valid topic."
+        return rejected("Please enter a valid topic.")
 
     base_max = 320 if plan == "free" else 800
     mode = mode.lower()
@@ -318,23 +365,32 @@ def generate_notes_with_groq(
     if user_prompt and len(user_prompt.strip()) > 80:
         pasted_mode = True
 
+    # Budget key for the prompt family below
+    prompt_kind = mode
+
     # ---------- TUTOR MODE ----------
     if mode == "tutor":
         prompt, temperature, max_tokens = tutor_chat_prompt(lesson)
 
     # ---------- POETRY MODE ----------
     elif is_poem_topic(lesson):
+        prompt_kind = "poetry"
         prompt, temperature, max_tokens = poetry_prompt(lesson)
 
     # ---------- PASTED TEXT MODE ----------
     elif pasted_mode:
+        prompt_kind = "paste"
         try:
             prompt, temperature, max_tokens = build_paste_prompt(user_prompt, mode)
         except ValueError:
-            return "Invalid generation mode."
+            return rejected("Invalid generation mode.")
 
     # ---------- NORMAL TOPIC MODE ----------
     else:
+        # Typed topics differ only in case ("Ecosystem" / "ecosystem");
+        # fold them so they share one cached answer
+        lesson = lesson.strip().casefold()
+
         # ===================== CHANGE F: prose_prompt for English prose chapters =====================
         if mode == "english":
             prompt, temperature, max_tokens = prose_prompt(lesson)
@@ -342,7 +398,7 @@ def generate_notes_with_groq(
             try:
                 prompt, temperature, max_tokens = build_prompt(lesson, mode)
             except ValueError:
-                return "Invalid generation mode."
+                return rejected("Invalid generation mode.")
         # =================== END CHANGE F ===================
 
         # attach extra instruction if small
@@ -351,12 +407,17 @@ def generate_notes_with_groq(
 
     max_tokens = min(max_tokens, base_max)
 
-    # ===================== CHANGE F: Prefix every prompt with SYLLABUS_BLOCK =====================
-    board_value = board.strip() if board and board.strip() else "Not specified by student"
-    class_level_value = class_level.strip() if class_level and class_level.strip() else "Not specified by student"
-    subject_value = subject.strip() if subject and subject.strip() else "Not specified by student"
+    # ===================== CHANGE F: Prefix notes prompts with SYLLABUS_BLOCK =====================
+    # Tutor prompts carry their own teaching rules and already embed the
+    # lesson, so the syllabus block and context would only add tokens.
+    preamble = ""
+
+    if mode != "tutor":
+        board_value = board.strip() if board and board.strip() else "Not specified by student"
+        class_level_value = class_level.strip() if class_level and class_level.strip() else "Not specified by student"
+        subject_value = subject.strip() if subject and subject.strip() else "Not specified by student"
 
-    syllabus_context = f"""SYLLABUS CONTEXT PROVIDED BY STUDENT:
+        syllabus_context = f"""SYLLABUS CONTEXT PROVIDED BY STUDENT:
 
 Board / University: {board_value}
 Class / Semester: {class_level_value}
@@ -364,12 +425,76 @@ Subject: {subject_value}
 Chapter / Topic: {lesson}
 """
 
-    prompt = f"{SYLLABUS_BLOCK}\n{syllabus_context}\n{prompt}"
+        preamble = f"{SYLLABUS_BLOCK}\n{syllabus_context}"
+        prompt = f"{preamble}\n{prompt}"
     # =================== END CHANGE F ===================
 
-    return groq_generate(
-        prompt=prompt,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        history=history
-    )
+    # ---------- INPUT TOKEN BUDGET ----------
+    # History gets whatever the prompt leaves; oldest turns go first
+    history = compact_history(history, input_budget(prompt_kind) - estimate_tokens(prompt))
+
+    # Model route: tutor callers tag their branch, notes use the prompt family
+    if not call_site:
+        call_site = "tutor" if mode == "tutor" else f"notes.{prompt_kind}"
+
+    primary_model = model_router.primary(call_site, plan)
+
+    # ---------- RESPONSE CACHE (notes modes only) ----------
+    cache_key = None
+
+    if mode != "tutor" and is_cacheable(temperature, history):
+        cache_key = make_cache_key(prompt, primary_model, temperature, max_tokens)
+        cached = llm_cache.get(cache_key)
+
+        if cached is not None:
+            return reply(cached)
+
+    # Long pasted lessons: chunked map-reduce instead of one huge prompt
+    long_paste = prompt_kind == "paste" and needs_map_reduce(user_prompt)
+
+    def call_groq():
+        if long_paste:
+            return map_reduce_notes(
+                user_prompt,
+                mode,
+                preamble,
+                max_tokens,
+                plan=plan,
+                stream=stream,
+                deadline=deadline,
+                call_site=call_site
+            )
+
+        return groq_generate(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            history=history,
+            stream=stream,
+            deadline=deadline,
+            call_site=call_site,
+            plan=plan
+        )
+
+    if cache_key is None:
+        return call_groq()
+
+    # ---------- COALESCE IDENTICAL IN-FLIGHT REQUESTS ----------
+    # A class generating the same topic shares one upstream call; other
+    # workers wait for the leader's result to land in the shared cache.
+    def lookup():
+        return llm_cache.peek(cache_key)
+
+    if stream:
+        return singleflight.stream(
+            cache_key,
+            lambda: llm_cache.wrap_stream(cache_key, call_groq(), primary_model),
+            lookup
+        )
+
+    def generate_and_store():
+        result = call_groq()
+        llm_cache.put(cache_key, result, primary_model)
+        return result
+
+    return singleflight.do(cache_key, generate_and_store, lookup)
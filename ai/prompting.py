@@ -0,0 +1,105 @@
+import os
+
+
+# ---------------- TOKEN ESTIMATION ----------------
+# Llama tokenizers average ~4 characters per token for English text and
+# far fewer for Devanagari / Kannada, so non-ASCII is weighted heavier.
+
+def estimate_tokens(text):
+    """
+    Cheap local token estimate; never calls the tokenizer.
+    """
+    if not text:
+        return 0
+
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    ascii_chars = len(text) - non_ascii
+
+    return ascii_chars // 4 + non_ascii // 2 + 1
+
+
+def estimate_messages_tokens(messages):
+    # ~4 tokens of chat-format overhead per message
+    return sum(estimate_tokens(m.get("content", "")) + 4 for m in messages or [])
+
+
+# ---------------- INPUT BUDGETS ----------------
+# Upper bound on prompt + history tokens sent per mode
+
+MODE_INPUT_BUDGETS = {
+    "tutor": 2500,
+    "board": 1800,
+    "college": 1800,
+    "short": 1400,
+    "mcq": 1800,
+    "english": 2000,
+    "poetry": 2000,
+    "paste": 6000
+}
+
+DEFAULT_INPUT_BUDGET = int(os.getenv("PROMPT_DEFAULT_BUDGET", "2500"))
+
+# Hard cap groq_generate applies to any history it is handed
+HISTORY_TOKEN_LIMIT = int(os.getenv("PROMPT_HISTORY_TOKEN_LIMIT", "1500"))
+
+# Room reserved for the "earlier in this conversation" recap
+RECAP_TOKENS = 120
+
+
+def input_budget(mode):
+    return MODE_INPUT_BUDGETS.get(mode, DEFAULT_INPUT_BUDGET)
+
+
+# ---------------- HISTORY COMPACTION ----------------
+
+def _recap(turns):
+    # Extractive recap of the most recent dropped turns
+    lines = []
+
+    for turn in turns[-3:]:
+        snippet = " ".join(turn.get("content", "").split())[:160]
+
+        if snippet:
+            lines.append(f"- {turn.get('role', 'assistant')}: {snippet}")
+
+    if not lines:
+        return None
+
+    return {
+        "role": "system",
+        "content": "Earlier in this conversation (condensed):\n" + "\n".join(lines)
+    }
+
+
+def compact_history(history, budget):
+    """
+    Keep the newest turns that fit in `budget` tokens. Older turns are
+    folded into a short recap message instead of being sent verbatim.
+    """
+    if not history:
+        return []
+
+    if budget <= 0:
+        return []
+
+    if estimate_messages_tokens(history) <= budget:
+        return list(history)
+
+    kept = []
+    used = RECAP_TOKENS
+
+    for turn in reversed(history):
+        cost = estimate_tokens(turn.get("content", "")) + 4
+
+        if used + cost > budget:
+            break
+
+        kept.append(turn)
+        used += cost
+
+    kept.reverse()
+
+    dropped = history[:len(history) - len(kept)]
+    recap = _recap(dropped)
+
+    return ([recap] if recap else []) + kept
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import has_app_context
+from sqlalchemy import bindparam, text
+
+from models_pg import db
+from ai.metrics import ratelimit_wait
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- SETTINGS ----------------
+# Per-model requests/tokens per minute, e.g.
+# GROQ_RATE_LIMITS='{"llama-3.1-8b-instant": {"rpm": 30, "tpm": 6000}}'
+
+GROQ_RATE_LIMIT_ENABLED = os.getenv("GROQ_RATE_LIMIT_ENABLED", "true").lower() == "true"
+GROQ_DEFAULT_RPM = float(os.getenv("GROQ_DEFAULT_RPM", "30"))
+GROQ_DEFAULT_TPM = float(os.getenv("GROQ_DEFAULT_TPM", "6000"))
+
+try:
+    GROQ_RATE_LIMITS = json.loads(os.getenv("GROQ_RATE_LIMITS", "{}"))
+except ValueError:
+    GROQ_RATE_LIMITS = {}
+
+# Longest single sleep while queued, so waiters re-check often
+MAX_POLL_INTERVAL = 1.0
+
+
+def get_limits(model):
+    limits = GROQ_RATE_LIMITS.get(model, {})
+
+    return (
+        float(limits.get("rpm", GROQ_DEFAULT_RPM)),
+        float(limits.get("tpm", GROQ_DEFAULT_TPM))
+    )
+
+
+def admission_seconds(model, cost):
+    """
+    Least time the model's token bucket needs to admit `cost` tokens in
+    total, starting full. Callers sharing the bucket only add to it.
+    """
+    if not GROQ_RATE_LIMIT_ENABLED:
+        return 0.0
+
+    _, tpm = get_limits(model)
+    return max(0.0, cost - tpm) / (tpm / 60.0)
+
+
+# ---------------- IN-PROCESS FALLBACK BUCKET ----------------
+class TokenBucket:
+    """
+    Single-process token bucket, used when Postgres is not reachable
+    (no app context, or a DB error).
+    """
+
+    def __init__(self, capacity, refill_per_sec):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_sec)
+        self.updated = now
+
+    def shortfall(self, cost):
+        # Seconds until `cost` tokens are available (0 = available now)
+        self._refill()
+        need = min(cost, self.capacity)
+
+        if self.tokens >= need:
+            return 0.0
+
+        return (need - self.tokens) / self.refill_per_sec
+
+    def take(self, cost):
+        self.tokens -= cost
+
+
+# ---------------- SHARED LIMITER ----------------
+class GroqRateLimiter:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ensured = set()
+        self._local = {}
+        self.counters = {
+            "acquired": 0,
+            "waited": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "rejected": 0,
+            "fallbacks": 0
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def _record(self, model, waited, acquired):
+        ratelimit_wait.observe(waited, model=model, outcome="admitted" if acquired else "rejected")
+
+        with self._lock:
+            if acquired:
+                self.counters["acquired"] += 1
+            else:
+                self.counters["rejected"] += 1
+
+            if waited > 0:
+                self.counters["waited"] += 1
+                self.counters["wait_seconds_total"] += waited
+                self.counters["wait_seconds_max"] = max(self.counters["wait_seconds_max"], waited)
+
+    # ----- POSTGRES STORE -----
+
+    def _ensure_buckets(self, conn, model):
+        if model in self._ensured:
+            return
+
+        rpm, tpm = get_limits(model)
+
+        for name, limit in ((f"rpm:{model}", rpm), (f"tpm:{model}", tpm)):
+            conn.execute(
+                text("""
+                    INSERT INTO groq_rate_buckets (name, capacity, tokens, refill_per_sec, updated_at)
+                    VALUES (:name, :capacity, :capacity, :refill, clock_timestamp()::timestamp)
+                    ON CONFLICT (name) DO UPDATE
+                    SET capacity = EXCLUDED.capacity,
+                        refill_per_sec = EXCLUDED.refill_per_sec
+                """),
+                {"name": name, "capacity": limit, "refill": limit / 60.0}
+            )
+
+        self._ensured.add(model)
+
+    def _db_try_acquire(self, model, cost):
+        """
+        Take 1 request and `cost` tokens from both shared buckets, or nothing.
+        Returns seconds to wait before trying again (0 = acquired).
+        """
+        wanted = {f"rpm:{model}": 1.0, f"tpm:{model}": float(cost)}
+
+        with db.engine.begin() as conn:
+            self._ensure_buckets(conn, model)
+
+            rows = conn.execute(
+                text("""
+                    SELECT name, capacity, refill_per_sec,
+                           LEAST(capacity, tokens + refill_per_sec *
+                                 EXTRACT(EPOCH FROM (clock_timestamp()::timestamp - updated_at))) AS available
+                    FROM groq_rate_buckets
+                    WHERE name IN :names
+                    ORDER BY name
+                    FOR UPDATE
+                """).bindparams(bindparam("names", expanding=True)),
+                {"names": list(wanted)}
+            ).all()
+
+            wait = 0.0
+
+            for row in rows:
+                need = min(wanted[row.name], row.capacity)
+
+                if row.available < need:
+                    wait = max(wait, (need - row.available) / row.refill_per_sec)
+
+            if wait > 0:
+                return wait
+
+            for row in rows:
+                conn.execute(
+                    text("""
+                        UPDATE groq_rate_buckets
+                        SET tokens = :tokens, updated_at = clock_timestamp()::timestamp
+                        WHERE name = :name
+                    """),
+                    {"name": row.name, "tokens": row.available - wanted[row.name]}
+                )
+
+        return 0.0
+
+    # ----- LOCAL STORE -----
+
+    def _local_try_acquire(self, model, cost):
+        with self._lock:
+            if model not in self._local:
+                rpm, tpm = get_limits(model)
+                self._local[model] = (TokenBucket(rpm, rpm / 60.0), TokenBucket(tpm, tpm / 60.0))
+
+            requests_bucket, tokens_bucket = self._local[model]
+            wait = max(requests_bucket.shortfall(1), tokens_bucket.shortfall(cost))
+
+            if wait == 0:
+                requests_bucket.take(1)
+                tokens_bucket.take(cost)
+
+            return wait
+
+    def _try_acquire(self, model, cost):
+        if has_app_context():
+            try:
+                return self._db_try_acquire(model, cost)
+            except Exception:
+                logger.exception("Shared rate limiter unavailable, using local bucket")
+
+        with self._lock:
+            self.counters["fallbacks"] += 1
+
+        return self._local_try_acquire(model, cost)
+
+    def acquire(self, model, cost, timeout):
+        """
+        Block until the model's buckets admit one request of `cost` tokens.
+        Returns False if that would take longer than `timeout` seconds.
+        """
+        if not GROQ_RATE_LIMIT_ENABLED:
+            return True
+
+        started = time.monotonic()
+
+        while True:
+            wait = self._try_acquire(model, cost)
+            waited = time.monotonic() - started
+
+            if wait == 0:
+                self._record(model, waited, True)
+                return True
+
+            if waited + wait > timeout:
+                self._record(model, waited, False)
+                return False
+
+            time.sleep(min(wait, MAX_POLL_INTERVAL) + random.uniform(0, 0.05))
+
+
+rate_limiter = GroqRateLimiter()
@@ -0,0 +1,140 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+# ---------------- BACKOFF ----------------
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """
+    Full-jitter exponential backoff for the given retry attempt (0-based).
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP date).
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+# ---------------- CIRCUIT BREAKER ----------------
+class CircuitBreaker:
+    """
+    Per-process breaker: opens after `failure_threshold` consecutive
+    failures, fails fast for `recovery_timeout` seconds, then lets a
+    single trial call through (half-open) to decide whether to close.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._open_until = 0.0
+        self._rejected = 0
+
+    def _refresh(self):
+        if self._state == self.OPEN and time.monotonic() >= self._open_until:
+            self._state = self.HALF_OPEN
+            self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def allow(self):
+        """
+        True if a call may go upstream right now.
+        """
+        with self._lock:
+            self._refresh()
+
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_running = False
+
+    def release(self):
+        """
+        End a call that produced no verdict, so the half-open trial slot
+        goes to the next caller. A no-op once success or failure is recorded.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self, cooldown=None):
+        """
+        Count a failure; cooldown (e.g. from Retry-After) extends the open window.
+        """
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.time()
+                self._open_until = time.monotonic() + max(self.recovery_timeout, cooldown or 0)
+
+    def retry_in(self):
+        """
+        Seconds until an open breaker lets a trial call through.
+        """
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+
+            return max(0.0, self._open_until - time.monotonic())
+
+    def snapshot(self):
+        with self._lock:
+            self._refresh()
+
+            return {
+                "name": self.name,
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "opened_at": self._opened_at if self._state != self.CLOSED else None,
+                "rejected_calls": self._rejected
+            }
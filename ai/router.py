@@ -0,0 +1,158 @@
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+
+# ---------------- MODELS ----------------
+
+FAST_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+QUALITY_MODEL = os.getenv("GROQ_QUALITY_MODEL", "llama-3.3-70b-versatile")
+
+# ---------------- ROUTING TABLE ----------------
+# call site -> plan -> [primary, fallback, ...]. Call sites are dotted
+# ("notes.mcq", "tutor.doubt") and fall back to their parent ("notes",
+# "tutor"), then to "default". "*" matches any plan.
+# Override with GROQ_MODEL_ROUTES (same JSON shape).
+
+DEFAULT_ROUTES = {
+    "default": {"*": [FAST_MODEL, QUALITY_MODEL]},
+
+    # Tiny, latency-critical calls always take the cheapest model
+    "memory.grade": {"*": [FAST_MODEL, QUALITY_MODEL]},
+    "memory.questions": {"*": [FAST_MODEL, QUALITY_MODEL]},
+    "chat": {"*": [FAST_MODEL, QUALITY_MODEL]},
+
+    "notes": {
+        "free": [FAST_MODEL, QUALITY_MODEL],
+        "pro": [QUALITY_MODEL, FAST_MODEL]
+    },
+    "tutor": {"*": [FAST_MODEL, QUALITY_MODEL]},
+    "evaluation": {"*": [QUALITY_MODEL, FAST_MODEL]},
+
+    # Background conversation summaries
+    "summary": {"*": [FAST_MODEL, QUALITY_MODEL]}
+}
+
+# Rolling median latency (seconds) above which a primary counts as slow
+DEFAULT_SLOW_AFTER = {
+    "default": 10.0,
+    "memory.grade": 2.5,
+    "memory.questions": 6.0,
+    "chat": 6.0,
+    "tutor": 8.0,
+    "notes": 12.0,
+    "evaluation": 12.0,
+    "summary": 6.0
+}
+
+try:
+    MODEL_ROUTES = {**DEFAULT_ROUTES, **json.loads(os.getenv("GROQ_MODEL_ROUTES", "{}"))}
+except ValueError:
+    MODEL_ROUTES = dict(DEFAULT_ROUTES)
+
+LATENCY_WINDOW = int(os.getenv("ROUTER_LATENCY_WINDOW", "50"))
+MIN_SAMPLES = 5
+
+# Cool-down after a 429 when Groq sends no Retry-After
+RATE_LIMIT_COOLDOWN = 30.0
+
+
+def _lookup(table, call_site):
+    site = call_site or "default"
+
+    while site:
+        if site in table:
+            return table[site]
+
+        site = site.rpartition(".")[0]
+
+    return table["default"]
+
+
+# ---------------- ROUTER ----------------
+class ModelRouter:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._limited_until = {}
+
+    def route(self, call_site, plan="free"):
+        """
+        Configured model list for a call site and plan, primary first.
+        """
+        by_plan = _lookup(MODEL_ROUTES, call_site)
+        models = by_plan.get(plan) or by_plan.get("*") or next(iter(by_plan.values()))
+
+        # Preserve order, drop duplicates (e.g. GROQ_MODEL == quality model)
+        return list(dict.fromkeys(models))
+
+    def primary(self, call_site, plan="free"):
+        return self.route(call_site, plan)[0]
+
+    def candidates(self, call_site, plan="free", is_open=None):
+        """
+        Models to try in order: healthy and fast first, then slow ones,
+        then rate-limited or breaker-open ones as a last resort.
+        """
+        slow_after = _lookup(DEFAULT_SLOW_AFTER, call_site)
+        now = time.monotonic()
+
+        healthy, slow, unavailable = [], [], []
+
+        for model in self.route(call_site, plan):
+            with self._lock:
+                limited = self._limited_until.get(model, 0) > now
+
+            if limited or (is_open and is_open(model)):
+                unavailable.append(model)
+            elif self.median_latency(model) > slow_after:
+                slow.append(model)
+            else:
+                healthy.append(model)
+
+        return healthy + slow + unavailable
+
+    # ----- FEEDBACK -----
+
+    def observe(self, model, seconds):
+        with self._lock:
+            window = self._latency.setdefault(model, deque(maxlen=LATENCY_WINDOW))
+            window.append(seconds)
+
+    def mark_rate_limited(self, model, retry_after=None):
+        with self._lock:
+            self._limited_until[model] = time.monotonic() + (retry_after or RATE_LIMIT_COOLDOWN)
+
+    def median_latency(self, model):
+        """
+        Rolling median latency, or 0 until there are enough samples.
+        """
+        with self._lock:
+            window = list(self._latency.get(model, ()))
+
+        if len(window) < MIN_SAMPLES:
+            return 0.0
+
+        return statistics.median(window)
+
+    def snapshot(self):
+        now = time.monotonic()
+
+        with self._lock:
+            models = set(self._latency) | set(self._limited_until)
+            limited = dict(self._limited_until)
+
+        return {
+            model: {
+                "median_latency": self.median_latency(model),
+                "rate_limited_for": max(0.0, limited.get(model, 0) - now)
+            }
+            for model in models
+        }
+
+
+model_router = ModelRouter()
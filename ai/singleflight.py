@@ -0,0 +1,287 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import has_app_context
+from sqlalchemy import text
+
+from ai.groq import ErrorChunk
+from models_pg import db
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- SETTINGS ----------------
+
+SINGLEFLIGHT_CROSS_WORKER = os.getenv("SINGLEFLIGHT_CROSS_WORKER", "true").lower() == "true"
+
+# How long a caller waits on another worker's identical request
+SINGLEFLIGHT_WAIT = float(os.getenv("SINGLEFLIGHT_WAIT", "45"))
+SINGLEFLIGHT_POLL = 0.25
+
+
+def _advisory_key(key):
+    # Postgres advisory locks take a signed 64-bit integer
+    value = int(hashlib.sha256(key.encode("utf-8")).hexdigest()[:16], 16)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+# ---------------- ONE IN-FLIGHT CALL ----------------
+class Flight:
+    """
+    Result of one upstream call, shared with every caller that asked
+    for the same key while it was running. Chunks are kept so late
+    joiners of a stream replay from the start.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.chunks = []
+        self.done = False
+        self.failed = False
+        self.followers = 0
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, failed=False):
+        with self._cond:
+            self.done = True
+            self.failed = failed
+            self._cond.notify_all()
+
+    def follow(self):
+        """
+        Yield chunks as the leader produces them.
+        """
+        index = 0
+
+        while True:
+            with self._cond:
+                while index >= len(self.chunks) and not self.done:
+                    self._cond.wait()
+
+                pending = self.chunks[index:]
+                finished = self.done
+
+            for chunk in pending:
+                yield chunk
+
+            index += len(pending)
+
+            if finished and index >= len(self.chunks):
+                return
+
+    def wait(self):
+        with self._cond:
+            while not self.done:
+                self._cond.wait()
+
+            return "".join(self.chunks)
+
+
+# ---------------- COALESCING GROUP ----------------
+class SingleFlight:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.counters = {
+            "leaders": 0,
+            "coalesced": 0,
+            "cross_worker_waits": 0,
+            "cross_worker_hits": 0
+        }
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.counters)
+            data["in_flight"] = len(self._flights)
+
+        return data
+
+    def _join(self, key):
+        with self._lock:
+            flight = self._flights.get(key)
+
+            if flight is not None:
+                self.counters["coalesced"] += 1
+                flight.followers += 1
+                return flight, False
+
+            flight = Flight()
+            self._flights[key] = flight
+            self.counters["leaders"] += 1
+            return flight, True
+
+    def _leave(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    @contextmanager
+    def _worker_lock(self, key, lookup):
+        """
+        Serialize identical calls across workers with a Postgres advisory
+        lock. Yields a result another worker already produced, or None
+        when this caller should make the upstream call itself.
+        """
+        if not (SINGLEFLIGHT_CROSS_WORKER and lookup and has_app_context()):
+            yield None
+            return
+
+        lock_id = _advisory_key(key)
+
+        try:
+            conn = db.engine.connect()
+        except Exception:
+            logger.exception("Singleflight could not reach Postgres")
+            yield None
+            return
+
+        locked = False
+        found = None
+
+        try:
+            started = time.monotonic()
+            waited = False
+
+            while True:
+                locked = conn.execute(
+                    text("SELECT pg_try_advisory_lock(:id)"), {"id": lock_id}
+                ).scalar()
+                conn.commit()
+
+                if locked and not waited:
+                    break
+
+                # Whoever held the lock may have finished the work already
+                found = lookup()
+
+                if found is not None or locked:
+                    break
+
+                if time.monotonic() - started > SINGLEFLIGHT_WAIT:
+                    break
+
+                waited = True
+                time.sleep(SINGLEFLIGHT_POLL)
+
+            with self._lock:
+                if waited:
+                    self.counters["cross_worker_waits"] += 1
+
+                if found is not None:
+                    self.counters["cross_worker_hits"] += 1
+
+            yield found
+
+        finally:
+            try:
+                if locked:
+                    conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": lock_id})
+                    conn.commit()
+            finally:
+                conn.close()
+
+    def do(self, key, fn, lookup=None):
+        """
+        Return fn() for key, sharing one call among concurrent callers.
+        lookup() is checked for a result stored by another worker.
+        """
+        flight, leader = self._join(key)
+
+        if not leader:
+            result = flight.wait()
+            return fn() if flight.failed else result
+
+        failed = True
+
+        try:
+            with self._worker_lock(key, lookup) as found:
+                result = found if found is not None else fn()
+
+            flight.publish(result)
+            failed = False
+            return result
+
+        finally:
+            self._leave(key, flight)
+            flight.finish(failed=failed)
+
+    def stream(self, key, fn, lookup=None):
+        """
+        Streaming variant of do(): fn() returns an iterator of chunks and
+        every caller for the same key receives the same chunks.
+        Joining is deferred to the first chunk, so a response that is
+        never iterated cannot leave a flight behind.
+        """
+        flight, leader = self._join(key)
+
+        if leader:
+            yield from self._lead(key, flight, fn, lookup)
+        else:
+            yield from self._follow(flight, fn)
+
+    def _follow(self, flight, fn):
+        sent = False
+
+        for chunk in flight.follow():
+            sent = True
+            yield chunk
+
+        if not flight.failed:
+            return
+
+        # Leader went away before producing anything: make our own call
+        if not sent:
+            yield from fn()
+            return
+
+        # Part of an answer already went out; mark it as cut off
+        yield ErrorChunk("AI service unavailable.")
+
+    def _lead(self, key, flight, fn, lookup):
+        failed = True
+
+        try:
+            # Streams do not queue on the advisory lock: that would pin a
+            # pooled connection for the whole answer and hold back the
+            # first token. Only a finished result from another worker counts.
+            found = lookup() if lookup else None
+
+            if found is not None:
+                with self._lock:
+                    self.counters["cross_worker_hits"] += 1
+
+                flight.publish(found)
+                yield found
+            else:
+                upstream = iter(fn())
+
+                try:
+                    for chunk in upstream:
+                        flight.publish(chunk)
+                        yield chunk
+
+                except GeneratorExit:
+                    # Our client left; finish the answer for the others
+                    if not flight.followers:
+                        raise
+
+                    for chunk in upstream:
+                        flight.publish(chunk)
+
+            failed = False
+
+        finally:
+            self._leave(key, flight)
+            flight.finish(failed=failed)
+
+
+singleflight = SingleFlight()
@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+
+from models_pg import db, ChatSession, Chat, TutorSession, TutorMessage
+from ai.groq import groq_generate, is_error_reply
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- SETTINGS ----------------
+# After each turn, everything but the newest exchanges is folded into a
+# short running summary stored on the session row. Prompts then carry
+# summary + recent turns instead of the whole conversation.
+
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+
+# Exchanges (question + answer) always sent verbatim
+SUMMARY_KEEP_EXCHANGES = int(os.getenv("SUMMARY_KEEP_EXCHANGES", "2"))
+
+SUMMARY_MAX_TOKENS = 220
+SUMMARY_TURN_CHARS = 1500
+
+
+# ---------------- PROMPTS ----------------
+
+def summary_message(summary):
+    """
+    The running summary as a history message, or None.
+    """
+    if not summary:
+        return None
+
+    return {
+        "role": "system",
+        "content": f"Summary of the conversation so far:\n{summary}"
+    }
+
+
+def _summary_prompt(summary, turns):
+    lines = []
+
+    for role, content in turns:
+        speaker = "Student" if role == "user" else "Tutor"
+        lines.append(f"{speaker}: {' '.join(content.split())[:SUMMARY_TURN_CHARS]}")
+
+    new_turns = "\n".join(lines)
+
+    return f"""
+Update the running summary of a student's study conversation.
+
+CURRENT SUMMARY:
+{summary or "(empty)"}
+
+NEW TURNS:
+{new_turns}
+
+Write the UPDATED summary in at most 120 words:
+- Topics covered and key points already explained, in order
+- Where the explanation stopped and what the student found difficult
+- Student preferences (language, level) if stated
+Output ONLY the summary text.
+"""
+
+
+# ---------------- SESSION ADAPTERS ----------------
+# Each returns the session row and its unsummarized units in order:
+# [(row id, [(role, content), ...]), ...]
+
+def _tutor_units(session_id):
+    tutor_session = db.session.get(TutorSession, session_id)
+
+    if not tutor_session:
+        return None, []
+
+    rows = (
+        TutorMessage.query
+        .filter(TutorMessage.session_id == session_id, TutorMessage.id > tutor_session.summary_upto)
+        .order_by(TutorMessage.id)
+        .all()
+    )
+
+    units = [(row.id, [(row.role, row.message or "")]) for row in rows]
+
+    # One message per row, so an exchange is two rows
+    keep = SUMMARY_KEEP_EXCHANGES * 2
+    return tutor_session, units[:max(0, len(units) - keep)]
+
+
+def _chat_units(session_id):
+    chat_session = db.session.get(ChatSession, session_id)
+
+    if not chat_session:
+        return None, []
+
+    rows = (
+        Chat.query
+        .filter(Chat.session_id == session_id, Chat.id > chat_session.summary_upto)
+        .order_by(Chat.id)
+        .all()
+    )
+
+    units = [
+        (row.id, [("user", row.question or ""), ("assistant", row.answer or "")])
+        for row in rows
+    ]
+
+    return chat_session, units[:max(0, len(units) - SUMMARY_KEEP_EXCHANGES)]
+
+
+ADAPTERS = {
+    "tutor": (TutorSession, _tutor_units),
+    "chat": (ChatSession, _chat_units)
+}
+
+
+# ---------------- REFRESH ----------------
+
+def refresh_summary(kind, session_id):
+    """
+    Fold the session's older unsummarized turns into its summary.
+    """
+    model, load_units = ADAPTERS[kind]
+    row, units = load_units(session_id)
+
+    if not row or not units:
+        return
+
+    turns = [turn for _, unit_turns in units for turn in unit_turns]
+    previous_upto = row.summary_upto
+
+    summary = groq_generate(
+        prompt=_summary_prompt(row.summary, turns),
+        max_tokens=SUMMARY_MAX_TOKENS,
+        temperature=0.1,
+        deadline=20,
+        call_site=f"summary.{kind}"
+    )
+
+    if is_error_reply(summary) or not summary.strip():
+        return
+
+    # Only move forward; a concurrent refresh from another worker may have won
+    model.query.filter_by(id=session_id, summary_upto=previous_upto).update({
+        "summary": summary.strip(),
+        "summary_upto": units[-1][0]
+    }, synchronize_session=False)
+
+    db.session.commit()
+
+
+# ---------------- BACKGROUND SCHEDULING ----------------
+
+_lock = threading.Lock()
+_pending = set()
+_rerun = set()
+_executor = None
+
+
+def _get_executor():
+    # Created lazily so each forked web worker gets its own threads
+    global _executor
+
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summary")
+
+        return _executor
+
+
+def _run(app, key):
+    kind, session_id = key
+
+    try:
+        while True:
+            with app.app_context():
+                refresh_summary(kind, session_id)
+
+            # A turn arrived while we were summarizing: go again
+            with _lock:
+                if key not in _rerun:
+                    _pending.discard(key)
+                    return
+
+                _rerun.discard(key)
+
+    except Exception:
+        logger.exception("Summary refresh failed for %s session %s", kind, session_id)
+
+        with _lock:
+            _pending.discard(key)
+            _rerun.discard(key)
+
+
+def schedule_summary(kind, session_id):
+    """
+    Refresh a session's summary in the background after a turn.
+    """
+    if not SUMMARY_ENABLED or not has_app_context():
+        return
+
+    key = (kind, session_id)
+
+    with _lock:
+        if key in _pending:
+            _rerun.add(key)
+            return
+
+        _pending.add(key)
+
+    _get_executor().submit(_run, current_app._get_current_object(), key)
@@ -30,6 +30,8 @@ from voice.routes import voice_bp
 from stt.routes import stt_bp
 from tutor import tutor_bp
 from progress.routes import progress_bp
+from metrics.routes import metrics_bp
+from jobs.routes import jobs_bp
 
 from utils.security import generate_csrf
 
@@ -42,6 +44,9 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev_secret_key")
 
+# Reject oversized uploads (photos, audio) before they are read into memory
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_MB", "16")) * 1024 * 1024
+
 
 # ----------- POSTGRESQL CONFIGURATION -----------
 
@@ -80,6 +85,8 @@ app.register_blueprint(tutor_bp)
 app.register_blueprint(voice_bp)
 app.register_blueprint(stt_bp)
 app.register_blueprint(progress_bp)
+app.register_blueprint(metrics_bp)
+app.register_blueprint(jobs_bp)
 
 
 # ---------------- CSRF TOKEN ----------------
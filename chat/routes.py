@@ -1,9 +1,10 @@
-from flask import Blueprint, request, session, redirect, render_template
-from datetime import date
+from flask import Blueprint, request, session, redirect, render_template, Response, stream_with_context
 
 from models_pg import db, ChatSession, Chat, User
 from utils.db_helpers import get_user_plan, is_admin
-from ai.groq import groq_generate
+from ai.groq import groq_generate, is_error_chunk
+from utils.quota import reserve
+from ai.summarizer import schedule_summary
 
 from chat.utils import get_chat_context, update_session_title
 from flask import current_app
@@ -23,7 +24,6 @@ def chat_page():
     return render_template("chat.html", sessions=sessions)
 
 from flask import request, session, current_app
-from datetime import date
 
 @chat_bp.route("/chat_stream", methods=["POST"])
 def chat_stream():
@@ -41,15 +41,11 @@ def chat_stream():
     user_id = session["user_id"]
     plan = get_user_plan(user_id)
 
-    # ---------- FREE PLAN LIMIT ----------
-    if plan == "free" and not is_admin():
-        today_count = Chat.query.filter(
-            Chat.user_id == user_id,
-            Chat.created == date.today()
-        ).count()
+    # ---------- FREE PLAN LIMIT (atomic; refunded if the AI fails) ----------
+    reservation = reserve(user_id, "chat", limited=plan == "free" and not is_admin())
 
-        if today_count >= 10:
-            return "Daily chat limit reached. Upgrade to Pro.", 403
+    if reservation is None:
+        return "Daily chat limit reached. Upgrade to Pro.", 403
 
     # ---------- CHAT SESSION LOGIC ----------
     session_id = request.form.get("session_id")
@@ -88,10 +84,14 @@ PREVIOUS CONTEXT (if relevant):
 
 ANSWER:
 """
-            answer = groq_generate(
+            chunks = groq_generate(
                 prompt=prompt,
                 image=image,
-                max_tokens=400
+                max_tokens=400,
+                stream=True,
+                deadline=30,
+                call_site="chat.image",
+                plan=plan
             )
         else:
             prompt = f"""
@@ -111,38 +111,75 @@ QUESTION:
 
 ANSWER:
 """
-            answer = groq_generate(
+            chunks = groq_generate(
                 prompt=prompt,
                 max_tokens=300,
-                temperature=0.15
+                temperature=0.15,
+                stream=True,
+                deadline=30,
+                call_site="chat",
+                plan=plan
             )
 
     except Exception:
         # 🔐 LOG FULL ERROR SAFELY
         current_app.logger.exception("Groq API failed in chat_stream")
+        reservation.refund()
         return "AI is temporarily unavailable. Please try again later.", 500
 
-    # -------- SAVE CHAT MESSAGE --------
-    try:
-        new_chat = Chat(
-            user_id=user_id,
-            session_id=session_id,
-            question=question if question else "[Image Uploaded]",
-            answer=answer
-        )
-        db.session.add(new_chat)
-        db.session.commit()
-
-        update_session_title(
-            session_id,
-            question if question else "Image Chat"
-        )
+    # -------- STREAM ANSWER, THEN SAVE CHAT MESSAGE --------
+    def generate():
+        parts = []
+        saved = False
+        failed = False
+
+        try:
+            for chunk in chunks:
+                failed = failed or is_error_chunk(chunk)
+                parts.append(chunk)
+                yield chunk
+
+            answer = "".join(parts)
+
+            # Failed or cut-off answers are not saved
+            if failed or not answer.strip():
+                return
+
+            new_chat = Chat(
+                user_id=user_id,
+                session_id=session_id,
+                question=question if question else "[Image Uploaded]",
+                answer=answer
+            )
+            db.session.add(new_chat)
+            db.session.commit()
+            saved = True
 
-    except Exception:
-        current_app.logger.exception("Database error while saving chat")
-        return "Failed to save chat. Please try again.", 500
+            update_session_title(
+                session_id,
+                question if question else "Image Chat"
+            )
 
-    return answer
+            schedule_summary("chat", session_id)
+
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Database error while saving chat")
+
+        finally:
+            # Failed, unsaved or abandoned answers do not use up quota
+            if not saved:
+                reservation.refund()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Chat-Session-Id": str(session_id)
+        }
+    )
 
 
 @chat_bp.route("/chat/delete/<int:session_id>", methods=["POST"])
@@ -62,18 +62,31 @@ def update_session_title(session_id, question):
 
 def get_chat_context(user_id, session_id, limit=4):
     """
-    Return last few messages for AI context
+    Return the running summary plus the recent messages it does not
+    cover yet (at most `limit`) for AI context
     """
 
-    rows = Chat.query.filter_by(
-        user_id=user_id,
-        session_id=session_id
+    chat_session = ChatSession.query.filter_by(
+        id=session_id,
+        user_id=user_id
+    ).first()
+
+    if not chat_session:
+        return ""
+
+    rows = Chat.query.filter(
+        Chat.user_id == user_id,
+        Chat.session_id == session_id,
+        Chat.id > chat_session.summary_upto
     ).order_by(Chat.id.desc()).limit(limit).all()
 
     rows = rows[::-1]  # keep correct order
 
     context = ""
 
+    if chat_session.summary:
+        context += f"Summary of earlier conversation:\n{chat_session.summary}\n\n"
+
     for r in rows:
         context += f"Student: {r.question}\n"
         context += f"Assistant: {r.answer}\n\n"
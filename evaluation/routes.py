@@ -1,4 +1,4 @@
-from flask import Blueprint, request, session, redirect, render_template, current_app
+from flask import Blueprint, request, session, redirect, render_template, current_app, Response, stream_with_context
 from evaluation.utils import evaluate_answer_ai
 from utils.db_helpers import get_user_plan, is_admin
 from utils.security import verify_csrf
@@ -46,9 +46,16 @@ def evaluate_answer():
 
     # ---------- AI EVALUATION ----------
     try:
-        output = evaluate_answer_ai(question, answer)
+        chunks = evaluate_answer_ai(question, answer, stream=True)
     except Exception:
         current_app.logger.exception("Evaluation AI failed")
         return "Evaluation service temporarily unavailable. Please try again.", 500
 
-    return output
+    return Response(
+        stream_with_context(chunks),
+        mimetype="text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -1,9 +1,10 @@
 from ai.groq import groq_generate
 
 
-def evaluate_answer_ai(question, answer):
+def evaluate_answer_ai(question, answer, stream=False):
     if not question.strip() or not answer.strip():
-        return "Question and answer cannot be empty."
+        message = "Question and answer cannot be empty."
+        return iter([message]) if stream else message
 
     prompt = f"""
 You are a strict and experienced exam paper evaluator.
@@ -48,8 +49,13 @@ STUDENT ANSWER:
         return groq_generate(
             prompt=prompt,
             max_tokens=450,
-            temperature=0.15
+            temperature=0.15,
+            stream=stream,
+            deadline=40,
+            call_site="evaluation",
+            plan="pro"
         )
     except Exception as e:
         print("AI Evaluation Error:", e)
-        return "AI evaluation service unavailable. Please try again later."
+        message = "AI evaluation service unavailable. Please try again later."
+        return iter([message]) if stream else message
@@ -0,0 +1,38 @@
+"""
+Gunicorn hooks (this file is picked up automatically from the working
+directory; command-line settings still apply).
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+
+
+# Workers share their metrics through this directory (see ai/metrics.py)
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), "genias-metrics"))
+
+
+# Read-aloud sends short texts in the /voice URL (longer ones are POSTed)
+limit_request_line = 8190
+
+
+def on_starting(server):
+    # Counts from a previous run of the server must not be added in
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+
+
+def post_fork(server, worker):
+    # Warm the TTS channel in the background; the worker starts serving at once
+    from voice.utils import warm_up
+    from ai.metrics import start_flusher
+
+    threading.Thread(target=warm_up, name="tts-warmup", daemon=True).start()
+    start_flusher()
+
+
+def worker_exit(server, worker):
+    # Keep the final counts of a recycled worker
+    from ai.metrics import write_snapshot
+
+    write_snapshot()
@@ -0,0 +1,119 @@
+from datetime import date
+
+from models_pg import db, Note
+from ai.groq import is_error_reply
+from ai.notes import generate_notes_with_groq, paste_deadline
+from notes.utils import render_note_pdf
+from jobs.queue import job_handler, JobError, JOB_LEASE_SECONDS
+from tutor import image_explain_prompt
+from ocr.engine import extract_text, unpack_uploads, OCRError
+
+# Background jobs are not tied to a browser, so give the model longer
+JOB_AI_DEADLINE = 90
+
+
+def _notes_deadline(lesson, mode, user_prompt, plan):
+    # Long pastes wait on the rate limiter for every part; stay inside the lease
+    needed = paste_deadline(lesson, mode, user_prompt, plan) or 0
+    return min(max(JOB_AI_DEADLINE, needed), JOB_LEASE_SECONDS * 0.8)
+
+
+def _ocr(job, payload):
+    uploads = unpack_uploads(job.input_blob) if payload.get("bundle") else job.input_blob
+
+    try:
+        text = extract_text(uploads)
+    except OCRError as e:
+        raise JobError(str(e), retry=False)
+
+    if not text.strip():
+        raise JobError("Could not detect readable text in the image.", retry=False)
+
+    return text
+
+
+def _checked(output):
+    # groq_generate reports failures as reply text; retry those
+    if is_error_reply(output):
+        raise JobError(output)
+
+    return output
+
+
+# ---------------- NOTES ----------------
+
+@job_handler("notes.generate")
+def generate_note(job, payload):
+    lesson = payload.get("lesson", "")
+    mode = payload.get("mode", "board")
+    user_prompt = payload.get("user_prompt", "")
+    plan = payload.get("plan", "free")
+
+    output = _checked(generate_notes_with_groq(
+        lesson=lesson,
+        mode=mode,
+        user_prompt=user_prompt,
+        board=payload.get("board", ""),
+        class_level=payload.get("class_level", ""),
+        subject=payload.get("subject", ""),
+        plan=plan,
+        deadline=_notes_deadline(lesson, mode, user_prompt, plan)
+    ))
+
+    note = Note(
+        user_id=job.user_id,
+        lesson=payload.get("lesson", ""),
+        content=output,
+        created=date.today()
+    )
+
+    db.session.add(note)
+    db.session.commit()
+
+    return {"text": output, "note_id": note.id}, None
+
+
+@job_handler("notes.image")
+def image_note(job, payload):
+    extracted_text = _ocr(job, payload)
+
+    output = _checked(generate_notes_with_groq(
+        lesson="Image Based Notes",
+        mode=payload.get("mode", "board"),
+        user_prompt=extracted_text,
+        board=payload.get("board", ""),
+        class_level=payload.get("class_level", ""),
+        subject=payload.get("subject", ""),
+        plan=payload.get("plan", "free"),
+        deadline=_notes_deadline(
+            "Image Based Notes", payload.get("mode", "board"), extracted_text, payload.get("plan", "free")
+        )
+    ))
+
+    return {"text": output}, None
+
+
+@job_handler("notes.pdf")
+def note_pdf(job, payload):
+    note = Note.query.filter_by(id=payload.get("note_id"), user_id=job.user_id).first()
+
+    if not note:
+        raise JobError("Note not found", retry=False)
+
+    return {"filename": f"{note.lesson}.pdf"}, render_note_pdf(note.lesson, note.content)
+
+
+# ---------------- TUTOR ----------------
+
+@job_handler("tutor.image")
+def tutor_image(job, payload):
+    extracted_text = _ocr(job, payload)
+
+    answer = _checked(generate_notes_with_groq(
+        lesson=image_explain_prompt(extracted_text),
+        mode="tutor",
+        deadline=JOB_AI_DEADLINE,
+        call_site="tutor.image"
+    ))
+
+    return {"answer": answer}, None
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+
+from flask import jsonify, request
+
+from models_pg import db, Job
+from ai.resilience import backoff_delay
+from utils.quota import Reservation
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- SETTINGS ----------------
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", "5"))
+JOB_RETRY_CAP = float(os.getenv("JOB_RETRY_CAP", "120"))
+
+# A running job whose worker has been silent this long is re-queued
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+# Finished jobs (and their results) are kept this long
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+
+class JobError(Exception):
+    """
+    Raised by a handler. retry=False fails the job straight away with
+    `message` shown to the user.
+    """
+
+    def __init__(self, message, retry=True):
+        super().__init__(message)
+        self.retry = retry
+
+
+# ---------------- HANDLER REGISTRY ----------------
+
+HANDLERS = {}
+
+
+def job_handler(kind):
+    """
+    Register fn(job, payload) -> (result dict, result bytes or None).
+    """
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+# ---------------- WEB SIDE ----------------
+
+def wants_async():
+    """
+    Clients opt in to background processing with async=1.
+    """
+    value = request.values.get("async")
+
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get("async")
+
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def enqueue(kind, payload, user_id=None, input_blob=None, max_attempts=JOB_MAX_ATTEMPTS):
+    job = Job(
+        kind=kind,
+        user_id=user_id,
+        payload=json.dumps(payload),
+        input_blob=input_blob,
+        max_attempts=max_attempts
+    )
+
+    db.session.add(job)
+    db.session.commit()
+
+    return job
+
+
+def job_status(job):
+    data = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "created": job.created.isoformat() if job.created else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+    if job.status == "succeeded":
+        data["result"] = json.loads(job.result) if job.result else None
+
+        if job.result_blob is not None:
+            data["result_url"] = f"/jobs/{job.id}/result"
+
+    if job.status == "failed":
+        data["error"] = job.error
+
+    return data
+
+
+def accepted(job):
+    """
+    202 response telling the client where to poll.
+    """
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}"
+    }), 202
+
+
+# ---------------- WORKER SIDE ----------------
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_job(worker):
+    """
+    Lock the oldest runnable job. SKIP LOCKED lets many workers poll
+    the table without queueing behind each other.
+    """
+    job = (
+        Job.query
+        .filter(Job.status == "queued", Job.run_after <= datetime.utcnow())
+        .order_by(Job.run_after, Job.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+
+    if not job:
+        db.session.rollback()
+        return None
+
+    job.status = "running"
+    job.attempts += 1
+    job.locked_by = worker
+    job.locked_at = datetime.utcnow()
+    db.session.commit()
+
+    return job
+
+
+def _finish(job, status, error=None):
+    job.status = status
+    job.error = error
+    job.locked_by = None
+    job.locked_at = None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def _fail(job, error):
+    _finish(job, "failed", error)
+
+    # Give back the daily quota the web tier reserved for this job
+    quota = json.loads(job.payload).get("quota")
+
+    if quota:
+        Reservation.from_dict(quota).refund()
+
+
+def _retry_or_fail(job, error):
+    if job.attempts >= job.max_attempts:
+        _fail(job, error)
+        return
+
+    delay = JOB_RETRY_BASE + backoff_delay(job.attempts - 1, base=JOB_RETRY_BASE, cap=JOB_RETRY_CAP)
+
+    job.status = "queued"
+    job.error = error
+    job.locked_by = None
+    job.locked_at = None
+    job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+
+
+def run_job(job):
+    handler = HANDLERS.get(job.kind)
+
+    if not handler:
+        _fail(job, f"Unknown job kind: {job.kind}")
+        return
+
+    try:
+        result, blob = handler(job, json.loads(job.payload))
+
+    except JobError as e:
+        db.session.rollback()
+        logger.warning("Job %s (%s) failed: %s", job.id, job.kind, e)
+
+        if e.retry:
+            _retry_or_fail(job, str(e))
+        else:
+            _fail(job, str(e))
+        return
+
+    except Exception:
+        db.session.rollback()
+        logger.exception("Job %s (%s) crashed", job.id, job.kind)
+        _retry_or_fail(job, "Processing failed. Please try again.")
+        return
+
+    job.result = json.dumps(result)
+    job.result_blob = blob
+    _finish(job, "succeeded")
+
+
+def requeue_stale():
+    """
+    Put back jobs whose worker died mid-run (or fail them if out of
+    attempts), and drop finished jobs past retention.
+    """
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=JOB_LEASE_SECONDS)
+
+    expired = (
+        Job.query
+        .filter(Job.status == "running", Job.locked_at < stale)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+    for job in expired:
+        logger.warning("Job %s lost its worker %s", job.id, job.locked_by)
+        _retry_or_fail(job, "Worker stopped while processing.")
+
+    Job.query.filter(
+        Job.status.in_(("succeeded", "failed")),
+        Job.finished_at < now - timedelta(hours=JOB_RETENTION_HOURS)
+    ).delete(synchronize_session=False)
+
+    db.session.commit()
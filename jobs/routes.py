@@ -0,0 +1,51 @@
+from flask import Blueprint, jsonify, session, Response
+
+from models_pg import Job
+from jobs.queue import job_status
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+def _own_job(job_id):
+    if "user_id" not in session:
+        return None
+
+    return Job.query.filter_by(id=job_id, user_id=session["user_id"]).first()
+
+
+# ---------------- JOB STATUS ----------------
+@jobs_bp.route("/jobs/<int:job_id>")
+def job_detail(job_id):
+
+    job = _own_job(job_id)
+
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify(job_status(job))
+
+
+# ---------------- JOB RESULT FILE ----------------
+@jobs_bp.route("/jobs/<int:job_id>/result")
+def job_result(job_id):
+
+    job = _own_job(job_id)
+
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    if job.status != "succeeded":
+        return jsonify(job_status(job)), 409
+
+    if job.result_blob is None:
+        return jsonify(job_status(job)["result"])
+
+    filename = job_status(job)["result"].get("filename", f"job-{job.id}.pdf")
+
+    return Response(
+        job.result_blob,
+        mimetype="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment;filename={filename}"
+        }
+    )
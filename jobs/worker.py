@@ -0,0 +1,100 @@
+"""
+Background job worker pool.
+
+    python -m jobs.worker --processes 4
+
+Each process claims jobs from the Postgres `jobs` table with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of processes and hosts
+can share one queue. SIGTERM / Ctrl-C lets running jobs finish first.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+# How often each process looks for jobs orphaned by a dead worker
+JOB_REAP_INTERVAL = 60.0
+
+logger = logging.getLogger("jobs.worker")
+
+
+def work_loop(stop):
+    # Import inside the child so every process builds its own app and pool
+    from app import app
+    from jobs import handlers  # noqa: F401  registers the handlers
+    from jobs.queue import claim_job, run_job, requeue_stale, worker_name
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    name = worker_name()
+    next_reap = 0.0
+
+    logger.info("Job worker %s started", name)
+
+    while not stop.is_set():
+        with app.app_context():
+            try:
+                if time.monotonic() >= next_reap:
+                    requeue_stale()
+                    next_reap = time.monotonic() + JOB_REAP_INTERVAL
+
+                job = claim_job(name)
+
+                if job:
+                    logger.info("Running job %s (%s), attempt %s", job.id, job.kind, job.attempts)
+                    run_job(job)
+                    continue
+
+            except Exception:
+                logger.exception("Job worker %s loop error", name)
+
+        stop.wait(JOB_POLL_INTERVAL)
+
+    logger.info("Job worker %s stopped", name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOB_WORKERS", "2")))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+
+    stop = multiprocessing.Event()
+    processes = []
+
+    def shutdown(signum, frame):
+        logger.info("Stopping job workers (signal %s)", signum)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for index in range(args.processes):
+        process = multiprocessing.Process(target=work_loop, args=(stop,), name=f"job-worker-{index}")
+        process.start()
+        processes.append(process)
+
+    # Restart children that die unexpectedly
+    while not stop.is_set():
+        for index, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning("%s exited with %s, restarting", process.name, process.exitcode)
+                process = multiprocessing.Process(target=work_loop, args=(stop,), name=process.name)
+                process.start()
+                processes[index] = process
+
+        stop.wait(5)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
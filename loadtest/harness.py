@@ -0,0 +1,292 @@
+"""
+Replay a realistic traffic mix against a running app and report
+latency percentiles and throughput per endpoint.
+
+    python -m loadtest.harness --base-url http://127.0.0.1:5000 \\
+        --email load@example.com --password secret --register \\
+        --users 20 --duration 120 --memory-note-id 1
+
+Run the app against loadtest/standin.py to benchmark without real
+upstream credentials. The memory scenario needs a pro (or admin)
+account and a note id it owns; it is skipped without --memory-note-id.
+"""
+
+import argparse
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+
+LESSONS = [
+    "Photosynthesis", "Life Processes", "Chemical Reactions and Equations",
+    "Electricity", "The French Revolution", "Quadratic Equations",
+    "Acids, Bases and Salts", "Human Eye and the Colourful World",
+    "Nationalism in India", "Carbon and its Compounds"
+]
+
+QUESTIONS = [
+    "Explain the light reaction in photosynthesis",
+    "What is Ohm's law? Give an example",
+    "Why did the French Revolution start?",
+    "How do I find the roots of x^2 - 5x + 6 = 0?",
+    "Difference between acids and bases",
+    "What is a covalent bond?"
+]
+
+NOTE_MODES = ["board", "board", "short", "mcq", "college"]
+
+DEFAULT_MIX = "generate_stream=3,chat_stream=3,tutor_ask=3,memory_submit=1,progress=2"
+
+CSRF_RE = re.compile(r'name="csrf[-_]token"\s+(?:content|value)="([^"]+)"')
+
+
+# ---------------- RESULTS ----------------
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of an unsorted list.
+    """
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Results:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.first_byte = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint, status, seconds, ttfb=None, ok=True):
+        with self._lock:
+            self.statuses[endpoint][status] += 1
+
+            if not ok:
+                self.errors[endpoint] += 1
+                return
+
+            self.latency[endpoint].append(seconds)
+
+            if ttfb is not None:
+                self.first_byte[endpoint].append(ttfb)
+
+    def report(self, elapsed):
+        header = f"{'endpoint':<16}{'ok':>7}{'err':>6}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'ttfb50':>8}{'ttfb95':>8}"
+        lines = [header, "-" * len(header)]
+
+        for endpoint in sorted(self.statuses):
+            samples = self.latency[endpoint]
+            ttfb = self.first_byte[endpoint]
+            total = len(samples) + self.errors[endpoint]
+
+            lines.append(
+                f"{endpoint:<16}{len(samples):>7}{self.errors[endpoint]:>6}"
+                f"{total / elapsed:>8.2f}"
+                f"{percentile(samples, 50):>8.2f}{percentile(samples, 95):>8.2f}{percentile(samples, 99):>8.2f}"
+                f"{percentile(ttfb, 50) if ttfb else float('nan'):>8.2f}"
+                f"{percentile(ttfb, 95) if ttfb else float('nan'):>8.2f}"
+            )
+
+        lines.append("")
+
+        for endpoint in sorted(self.statuses):
+            codes = ", ".join(f"{code}: {count}" for code, count in sorted(self.statuses[endpoint].items(), key=lambda item: str(item[0])))
+            lines.append(f"{endpoint:<16}{codes}")
+
+        return "\n".join(lines)
+
+
+# ---------------- VIRTUAL USER ----------------
+
+class VirtualUser:
+
+    def __init__(self, args, results):
+        self.args = args
+        self.base = args.base_url.rstrip("/")
+        self.results = results
+        self.http = requests.Session()
+        self.csrf = None
+
+    def _refresh_csrf(self, path="/login"):
+        page = self.http.get(self.base + path, timeout=self.args.timeout)
+        match = CSRF_RE.search(page.text)
+
+        if match:
+            self.csrf = match.group(1)
+
+    def login(self):
+        self._refresh_csrf("/login")
+
+        if self.args.register:
+            self.http.post(self.base + "/register", data={
+                "username": self.args.email.split("@")[0],
+                "email": self.args.email,
+                "password": self.args.password,
+                "csrf_token": self.csrf
+            }, timeout=self.args.timeout, allow_redirects=False)
+
+        response = self.http.post(self.base + "/login", data={
+            "email": self.args.email,
+            "password": self.args.password,
+            "csrf_token": self.csrf
+        }, timeout=self.args.timeout, allow_redirects=False)
+
+        if response.status_code not in (200, 302):
+            raise RuntimeError(f"Login failed: {response.status_code} {response.text[:200]}")
+
+        # The CSRF token lives in the session, fetch it for the logged-in session
+        self._refresh_csrf("/dashboard")
+
+    # ----- TIMING -----
+
+    def _timed(self, endpoint, method, path, stream=False, ok_statuses=(200,), **kwargs):
+        started = time.perf_counter()
+        ttfb = None
+
+        try:
+            response = self.http.request(
+                method, self.base + path, stream=stream, timeout=self.args.timeout, **kwargs
+            )
+
+            if stream:
+                for chunk in response.iter_content(chunk_size=None):
+                    if ttfb is None and chunk:
+                        ttfb = time.perf_counter() - started
+
+            seconds = time.perf_counter() - started
+            self.results.record(endpoint, response.status_code, seconds, ttfb, response.status_code in ok_statuses)
+            return response
+
+        except requests.RequestException as exc:
+            self.results.record(endpoint, type(exc).__name__, time.perf_counter() - started, ok=False)
+            return None
+
+    # ----- SCENARIOS -----
+
+    def generate_stream(self):
+        self._timed("generate_stream", "POST", "/generate_stream", stream=True, data={
+            "lesson": random.choice(LESSONS),
+            "mode": random.choice(NOTE_MODES),
+            "board": "CBSE",
+            "class_level": "10",
+            "csrf_token": self.csrf
+        })
+
+    def chat_stream(self):
+        self._timed("chat_stream", "POST", "/chat_stream", stream=True, data={
+            "question": random.choice(QUESTIONS),
+            "csrf_token": self.csrf
+        })
+
+    def tutor_ask(self):
+        self._timed("tutor_ask", "POST", "/tutor/ask", json={
+            "question": random.choice(QUESTIONS),
+            "input_type": "question",
+            "language": "en"
+        })
+
+    def memory_submit(self):
+        if not self.args.memory_note_id:
+            return
+
+        started = self._timed(
+            "memory_start", "GET", f"/memory/start?note_id={self.args.memory_note_id}"
+        )
+
+        if started is None or started.status_code != 200:
+            return
+
+        answers = {f"answer{i}": random.choice(["", "It converts light energy", "I am not sure"]) for i in range(1, 6)}
+        answers["csrf_token"] = self.csrf
+
+        self._timed(
+            "memory_submit", "POST", "/memory/submit",
+            ok_statuses=(302,), allow_redirects=False, data=answers
+        )
+
+    def progress(self):
+        self._timed("progress", "GET", "/progress")
+
+
+# ---------------- DRIVER ----------------
+
+def parse_mix(spec):
+    weights = {}
+
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+
+    return weights
+
+
+def run_user(args, results, weights, stop_at):
+    user = VirtualUser(args, results)
+
+    try:
+        user.login()
+    except Exception as exc:
+        print("Virtual user could not log in:", exc)
+        return
+
+    names = list(weights)
+    totals = [weights[name] for name in names]
+
+    while time.monotonic() < stop_at:
+        scenario = random.choices(names, totals)[0]
+        getattr(user, scenario)()
+
+        # Think time between actions
+        time.sleep(random.uniform(0, args.think_time))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the app with a realistic traffic mix")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--register", action="store_true", help="create the account first")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to run")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds to start all users")
+    parser.add_argument("--think-time", type=float, default=1.0, help="max pause between actions")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight list")
+    parser.add_argument("--memory-note-id", type=int)
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    unknown = [name for name in weights if not hasattr(VirtualUser, name)]
+
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    results = Results()
+    started = time.monotonic()
+    stop_at = started + args.duration
+    threads = []
+
+    for index in range(args.users):
+        thread = threading.Thread(target=run_user, args=(args, results, weights, stop_at), daemon=True)
+        thread.start()
+        threads.append(thread)
+        time.sleep(args.ramp / max(1, args.users))
+
+    for thread in threads:
+        thread.join()
+
+    print(results.report(time.monotonic() - started))
+
+
+if __name__ == "__main__":
+    main()
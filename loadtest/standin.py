@@ -0,0 +1,291 @@
+"""
+Local stand-in for the Groq, Google TTS and Razorpay APIs, so the app
+can be load-tested without real credentials or upstream quotas.
+
+    python -m loadtest.standin --port 8090 --groq-ttft lognormal:0.4,0.5 \\
+        --groq-tps 250 --groq-error-rate 0.01 --groq-429-rate 0.02
+
+Then start the app with
+
+    GROQ_BASE_URL=http://127.0.0.1:8090 GROQ_API_KEY=standin
+    TTS_API_ENDPOINT=http://127.0.0.1:8090
+    RAZORPAY_BASE_URL=http://127.0.0.1:8090
+    RAZORPAY_KEY_ID=rzp_test_standin RAZORPAY_KEY_SECRET=standin
+
+Latency options take a distribution: "0.2" or "fixed:0.2",
+"uniform:0.1,0.6", or "lognormal:<median>,<sigma>".
+"""
+
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+
+from flask import Flask, Response, jsonify, request
+
+
+# ---------------- DISTRIBUTIONS ----------------
+
+def parse_distribution(spec):
+    """
+    Turn a distribution spec into a zero-argument sampler.
+    """
+    kind, _, args = str(spec).partition(":")
+
+    if not args:
+        kind, args = "fixed", kind
+
+    values = [float(v) for v in args.split(",")]
+
+    if kind == "fixed":
+        return lambda: values[0]
+
+    if kind == "uniform":
+        low, high = values
+        return lambda: random.uniform(low, high)
+
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma)
+
+    raise ValueError(f"Unknown distribution: {spec}")
+
+
+# ---------------- CONFIG ----------------
+
+class StandinConfig:
+
+    def __init__(self, args):
+        self.groq_ttft = parse_distribution(args.groq_ttft)
+        self.groq_tokens = parse_distribution(args.groq_tokens)
+        self.groq_tps = args.groq_tps
+        self.groq_error_rate = args.groq_error_rate
+        self.groq_429_rate = args.groq_429_rate
+        self.groq_retry_after = args.groq_retry_after
+        self.stt_latency = parse_distribution(args.stt_latency)
+        self.tts_latency = parse_distribution(args.tts_latency)
+        self.tts_error_rate = args.tts_error_rate
+        self.razorpay_latency = parse_distribution(args.razorpay_latency)
+        self.razorpay_error_rate = args.razorpay_error_rate
+
+
+WORDS = (
+    "photosynthesis chlorophyll energy light glucose oxygen water carbon "
+    "dioxide plant cell leaf stomata reaction process student exam answer "
+    "important point definition example diagram explain because therefore"
+).split()
+
+_counter_lock = threading.Lock()
+_counters = {}
+
+
+def _count(name):
+    with _counter_lock:
+        _counters[name] = _counters.get(name, 0) + 1
+
+
+def _fail(rate):
+    return random.random() < rate
+
+
+# ---------------- GROQ ----------------
+
+def _prompt_text(messages):
+    return "\n".join(str(m.get("content", "")) for m in messages)
+
+
+def _canned_reply(prompt):
+    # Grading prompts get parseable scores so the app's fallbacks stay quiet
+    if prompt.rstrip().endswith("SCORES:"):
+        numbers = re.findall(r"^\[(\d+)\]", prompt, re.M)
+        return "\n".join(f"{n}: {random.choice(['1', '0.5', '0'])}" for n in numbers)
+
+    if prompt.rstrip().endswith("SCORE:"):
+        return random.choice(["1", "0.5", "0"])
+
+    return None
+
+
+def _completion_words(config, max_tokens):
+    count = max(1, min(int(config.groq_tokens()), int(max_tokens or 500)))
+    return [random.choice(WORDS) for _ in range(count)]
+
+
+def register_groq(app, config):
+
+    @app.route("/openai/v1/chat/completions", methods=["POST"])
+    def chat_completions():
+        _count("groq_requests")
+
+        body = request.get_json(silent=True) or {}
+        model = body.get("model", "standin")
+        prompt = _prompt_text(body.get("messages", []))
+        prompt_tokens = len(prompt) // 4 + 1
+
+        if _fail(config.groq_429_rate):
+            _count("groq_429")
+            return jsonify({"error": {"message": "Rate limit reached", "type": "rate_limit"}}), 429, {
+                "Retry-After": str(config.groq_retry_after)
+            }
+
+        if _fail(config.groq_error_rate):
+            _count("groq_errors")
+            return jsonify({"error": {"message": "Service unavailable"}}), 503
+
+        canned = _canned_reply(prompt)
+        words = canned.split(" ") if canned else _completion_words(config, body.get("max_tokens"))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words)
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        ttft = config.groq_ttft()
+
+        if not body.get("stream"):
+            time.sleep(ttft + len(words) / config.groq_tps)
+
+            return jsonify({
+                "id": completion_id,
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+
+        def generate():
+            time.sleep(ttft)
+
+            # A few tokens per event, like the real API under load
+            for start in range(0, len(words), 4):
+                piece = words[start:start + 4]
+                text = ("" if start == 0 else " ") + " ".join(piece)
+                event = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(event)}\n\n"
+                time.sleep(len(piece) / config.groq_tps)
+
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return Response(generate(), mimetype="text/event-stream")
+
+    @app.route("/openai/v1/audio/transcriptions", methods=["POST"])
+    def transcriptions():
+        _count("stt_requests")
+        time.sleep(config.stt_latency())
+
+        return jsonify({"text": " ".join(random.choice(WORDS) for _ in range(12))})
+
+
+# ---------------- GOOGLE TTS (REST) ----------------
+
+def register_tts(app, config):
+
+    @app.route("/v1/text:synthesize", methods=["POST"])
+    def synthesize():
+        _count("tts_requests")
+
+        body = request.get_json(silent=True) or {}
+        text = (body.get("input") or {}).get("text", "")
+
+        time.sleep(config.tts_latency())
+
+        if _fail(config.tts_error_rate):
+            _count("tts_errors")
+            return jsonify({"error": {"code": 503, "message": "Backend unavailable", "status": "UNAVAILABLE"}}), 503
+
+        # Roughly 1 KB of "MP3" per 15 characters, the real ratio at 24 kbps
+        audio = b"ID3" + random.randbytes(max(256, len(text) * 70))
+
+        return jsonify({"audioContent": base64.b64encode(audio).decode("ascii")})
+
+
+# ---------------- RAZORPAY ----------------
+
+def register_razorpay(app, config):
+
+    @app.route("/v1/orders", methods=["POST"])
+    def create_order():
+        _count("razorpay_requests")
+        time.sleep(config.razorpay_latency())
+
+        if _fail(config.razorpay_error_rate):
+            _count("razorpay_errors")
+            return jsonify({"error": {"code": "SERVER_ERROR", "description": "Stand-in failure"}}), 500
+
+        body = request.get_json(silent=True) or {}
+
+        return jsonify({
+            "id": f"order_{uuid.uuid4().hex[:14]}",
+            "entity": "order",
+            "amount": body.get("amount", 0),
+            "currency": body.get("currency", "INR"),
+            "status": "created",
+            "notes": body.get("notes", {}),
+            "created_at": int(time.time())
+        })
+
+
+# ---------------- APP ----------------
+
+def create_app(config):
+    app = Flask(__name__)
+
+    register_groq(app, config)
+    register_tts(app, config)
+    register_razorpay(app, config)
+
+    @app.route("/_standin/stats")
+    def stats():
+        with _counter_lock:
+            return jsonify(dict(_counters))
+
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Groq/TTS/Razorpay stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+
+    parser.add_argument("--groq-ttft", default="lognormal:0.35,0.4", help="time to first token")
+    parser.add_argument("--groq-tokens", default="uniform:150,600", help="completion length")
+    parser.add_argument("--groq-tps", type=float, default=300.0, help="tokens per second after the first")
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--groq-429-rate", type=float, default=0.0)
+    parser.add_argument("--groq-retry-after", type=int, default=1)
+    parser.add_argument("--stt-latency", default="lognormal:0.6,0.3")
+
+    parser.add_argument("--tts-latency", default="lognormal:0.5,0.3")
+    parser.add_argument("--tts-error-rate", type=float, default=0.0)
+
+    parser.add_argument("--razorpay-latency", default="lognormal:0.25,0.3")
+    parser.add_argument("--razorpay-error-rate", type=float, default=0.0)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    create_app(StandinConfig(args)).run(host=args.host, port=args.port, threaded=True)
@@ -60,7 +60,14 @@ QUESTIONS:
 """
 
     try:
-        output = groq_generate(prompt, max_tokens=300, temperature=0.2)
+        output = groq_generate(
+            prompt,
+            max_tokens=300,
+            temperature=0.2,
+            deadline=20,
+            call_site="memory.questions",
+            plan=plan
+        )
     except Exception:
         current_app.logger.exception("Groq API failed in memory_start")
         return "AI is temporarily unavailable. Please try again later.", 500
@@ -1,15 +1,29 @@
-from ai.groq import groq_generate
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
+from flask import current_app, has_app_context
+
+from ai.groq import groq_generate, is_error_reply
+
+
+# "batch" grades every answer in one call, "concurrent" grades them in parallel
+MEMORY_GRADING_MODE = os.getenv("MEMORY_GRADING_MODE", "batch").lower()
+MEMORY_GRADING_WORKERS = int(os.getenv("MEMORY_GRADING_WORKERS", "5"))
+
+ALLOWED_SCORES = (0.0, 0.5, 1.0)
+
+# "3: 0.5", "[3] - 1", "3. 0" ...
+SCORE_LINE = re.compile(r"^\s*\[?(\d+)\]?\s*[:=\-.)]\s*([01](?:\.\d+)?)", re.M)
 
-def evaluate_memory_answers(questions, answers):
-    score = 0.0
-    total = len(questions)
 
-    for q, ans in zip(questions, answers):
-        if not ans:
-            continue
+def _clamp_score(value):
+    # Snap anything the model returns onto 0 / 0.5 / 1
+    return min(ALLOWED_SCORES, key=lambda allowed: abs(allowed - value))
 
-        prompt = f"""
+
+def _single_prompt(question, answer):
+    return f"""
 You are evaluating an ACTIVE RECALL answer.
 
 RULES:
@@ -23,25 +37,148 @@ SCORING:
 0   = wrong or irrelevant
 
 QUESTION:
-{q}
+{question}
 
 STUDENT ANSWER:
-{ans}
+{answer}
 
 SCORE:
 """
 
-        result = groq_generate(
-            prompt=prompt,
-            max_tokens=5,
-            temperature=0
-        )
+
+def _batch_prompt(items):
+    blocks = ""
+
+    for number, (question, answer) in items:
+        blocks += f"""
+[{number}]
+QUESTION:
+{question}
+
+STUDENT ANSWER:
+{answer}
+"""
+
+    return f"""
+You are evaluating ACTIVE RECALL answers.
+
+RULES:
+- Score EVERY numbered answer below
+- Allowed values: 1, 0.5, 0
+- Respond with ONLY one line per answer in the form: number: score
+- No explanation, no extra text
+
+SCORING:
+1   = fully correct
+0.5 = partially correct
+0   = wrong or irrelevant
+
+ANSWERS:
+{blocks}
+SCORES:
+"""
+
+
+def grade_single(question, answer):
+    """
+    Grade one answer. Returns None when the model reply is unusable.
+    """
+    result = groq_generate(
+        prompt=_single_prompt(question, answer),
+        max_tokens=5,
+        temperature=0,
+        deadline=8,
+        call_site="memory.grade"
+    )
+
+    if is_error_reply(result):
+        return None
+
+    try:
+        return _clamp_score(float(result.strip()))
+    except ValueError:
+        return None
+
+
+def grade_batch(items):
+    """
+    Grade [(number, (question, answer)), ...] in a single call.
+    Returns {number: score} for every line that could be parsed.
+    """
+    result = groq_generate(
+        prompt=_batch_prompt(items),
+        max_tokens=12 * len(items),
+        temperature=0,
+        deadline=15,
+        call_site="memory.grade"
+    )
+
+    if is_error_reply(result):
+        return {}
+
+    wanted = {number for number, _ in items}
+    scores = {}
+
+    for match in SCORE_LINE.finditer(result):
+        number = int(match.group(1))
+
+        if number in wanted and number not in scores:
+            scores[number] = _clamp_score(float(match.group(2)))
+
+    return scores
+
+
+def grade_concurrently(items):
+    """
+    Grade each item on a bounded thread pool.
+    Failed items are simply missing from the returned dict.
+    """
+    if not items:
+        return {}
+
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def run(item):
+        number, (question, answer) = item
 
         try:
-            score += float(result.strip())
-        except:
-            pass
+            if app is None:
+                return number, grade_single(question, answer)
+
+            with app.app_context():
+                return number, grade_single(question, answer)
+
+        except Exception:
+            return number, None
+
+    workers = max(1, min(MEMORY_GRADING_WORKERS, len(items)))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(run, items)
+
+    return {number: score for number, score in results if score is not None}
+
+
+def evaluate_memory_answers(questions, answers):
+    total = len(questions)
+
+    # Blank answers score zero without spending a call
+    items = [
+        (number, (q, ans))
+        for number, (q, ans) in enumerate(zip(questions, answers), start=1)
+        if ans
+    ]
+
+    if MEMORY_GRADING_MODE == "concurrent":
+        scores = grade_concurrently(items)
+    else:
+        scores = grade_batch(items) if items else {}
+
+        # Re-grade only the answers the batch reply left out
+        missing = [item for item in items if item[0] not in scores]
+        scores.update(grade_concurrently(missing))
 
+    score = float(sum(scores.values()))
     percentage = round((score / total) * 100, 2) if total else 0
 
     return score, total, percentage
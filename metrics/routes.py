@@ -0,0 +1,162 @@
+from flask import Blueprint, Response, request, abort
+import os
+import hmac
+
+from ai.metrics import render_metrics, register_collector, gauge_family
+from ai.cache import llm_cache
+from ai.ratelimit import rate_limiter
+from ai.singleflight import singleflight
+from ai.router import model_router
+from ai.groq import get_breaker_state
+from ocr.cache import ocr_cache
+from voice.cache import tts_cache
+
+metrics_bp = Blueprint("metrics", __name__)
+
+# Bearer token for scrapes. Without one /metrics is disabled, unless
+# METRICS_PUBLIC=true says the port is only reachable privately.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() == "true"
+
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+# ---------------- SCRAPE-TIME COLLECTORS ----------------
+# Events add up across workers; gauges say how they merge (sum or max)
+
+@register_collector
+def collect_cache():
+    stats = llm_cache.stats()
+
+    return [
+        gauge_family(
+            "llm_cache_events_total",
+            "LLM response cache events.",
+            [({"event": name}, value) for name, value in stats.items() if name != "local_size"],
+            kind="counter"
+        ),
+        gauge_family(
+            "llm_cache_local_entries",
+            "Entries in the workers' in-process LRUs.",
+            [({}, stats["local_size"])]
+        )
+    ]
+
+
+@register_collector
+def collect_ocr_cache():
+    stats = ocr_cache.stats()
+
+    return [
+        gauge_family(
+            "ocr_cache_events_total",
+            "OCR result cache events.",
+            [({"event": name}, value) for name, value in stats.items() if name != "local_size"],
+            kind="counter"
+        ),
+        gauge_family(
+            "ocr_cache_local_entries",
+            "Entries in the workers' in-process OCR LRUs.",
+            [({}, stats["local_size"])]
+        )
+    ]
+
+
+@register_collector
+def collect_tts_cache():
+    return [
+        gauge_family(
+            "tts_cache_events_total",
+            "TTS audio disk cache events.",
+            [({"event": name}, value) for name, value in tts_cache.stats().items()],
+            kind="counter"
+        )
+    ]
+
+
+@register_collector
+def collect_singleflight():
+    stats = singleflight.stats()
+
+    return [
+        gauge_family(
+            "llm_singleflight_events_total",
+            "Request coalescing events.",
+            [({"event": name}, value) for name, value in stats.items() if name != "in_flight"],
+            kind="counter"
+        ),
+        gauge_family(
+            "llm_singleflight_in_flight",
+            "Distinct upstream calls currently shared by waiters.",
+            [({}, stats["in_flight"])]
+        )
+    ]
+
+
+@register_collector
+def collect_rate_limiter():
+    stats = rate_limiter.stats()
+
+    return [
+        gauge_family(
+            "llm_ratelimit_fallbacks_total",
+            "Acquisitions served by the local bucket because Postgres was unavailable.",
+            [({}, stats["fallbacks"])],
+            kind="counter"
+        )
+    ]
+
+
+@register_collector
+def collect_router():
+    snapshot = model_router.snapshot()
+
+    return [
+        gauge_family(
+            "llm_model_median_latency_seconds",
+            "Rolling median latency the router uses per model (slowest worker).",
+            [({"model": model}, data["median_latency"]) for model, data in snapshot.items()],
+            merge="max"
+        ),
+        gauge_family(
+            "llm_model_rate_limited_seconds",
+            "Remaining 429 cool-down per model.",
+            [({"model": model}, data["rate_limited_for"]) for model, data in snapshot.items()],
+            merge="max"
+        )
+    ]
+
+
+@register_collector
+def collect_breakers():
+    models = get_breaker_state()["models"]
+
+    return [
+        gauge_family(
+            "llm_circuit_breaker_state",
+            "Worst circuit breaker state per model (0 closed, 1 half-open, 2 open).",
+            [({"model": name}, BREAKER_STATES[snap["state"]]) for name, snap in models.items()],
+            merge="max"
+        )
+    ]
+
+
+# ---------------- ENDPOINT ----------------
+
+@metrics_bp.route("/metrics")
+def metrics():
+
+    if not METRICS_TOKEN:
+        if not METRICS_PUBLIC:
+            abort(404)
+
+    else:
+        supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+
+        if not hmac.compare_digest(supplied, METRICS_TOKEN):
+            abort(401)
+
+    return Response(
+        render_metrics(),
+        mimetype="text/plain; version=0.0.4"
+    )
@@ -0,0 +1,40 @@
+"""add ocr cache table
+
+Revision ID: 3e8a5c1f9d62
+Revises: b6d03f5a9c27
+Create Date: 2026-10-18 15:21:07.640392
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3e8a5c1f9d62'
+down_revision = 'b6d03f5a9c27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # ---------------- OCR CACHE TABLE ----------------
+    op.create_table(
+        'ocr_cache',
+        sa.Column('key', sa.String(length=120), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('hits', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+        sa.Column('last_used', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+    with op.batch_alter_table('ocr_cache', schema=None) as batch_op:
+        batch_op.create_index('ix_ocr_cache_last_used', ['last_used'], unique=False)
+
+
+def downgrade():
+
+    with op.batch_alter_table('ocr_cache', schema=None) as batch_op:
+        batch_op.drop_index('ix_ocr_cache_last_used')
+
+    op.drop_table('ocr_cache')
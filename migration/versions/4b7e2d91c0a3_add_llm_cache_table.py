@@ -0,0 +1,44 @@
+"""add llm cache table
+
+Revision ID: 4b7e2d91c0a3
+Revises: cf52dea0dad3
+Create Date: 2026-10-18 09:12:40.218113
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2d91c0a3'
+down_revision = 'cf52dea0dad3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # ---------------- LLM CACHE TABLE ----------------
+    op.create_table(
+        'llm_cache',
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=100), nullable=False),
+        sa.Column('response', sa.Text(), nullable=False),
+        sa.Column('hits', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+        sa.Column('last_used', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key')
+    )
+
+    with op.batch_alter_table('llm_cache', schema=None) as batch_op:
+        batch_op.create_index('ix_llm_cache_last_used', ['last_used'], unique=False)
+        batch_op.create_index('ix_llm_cache_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+
+    with op.batch_alter_table('llm_cache', schema=None) as batch_op:
+        batch_op.drop_index('ix_llm_cache_expires_at')
+        batch_op.drop_index('ix_llm_cache_last_used')
+
+    op.drop_table('llm_cache')
@@ -0,0 +1,32 @@
+"""add rolling summaries to chat and tutor sessions
+
+Revision ID: 5c8e1d3b7f40
+Revises: e7b2c4f81a6d
+Create Date: 2026-10-18 12:48:31.907215
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5c8e1d3b7f40'
+down_revision = 'e7b2c4f81a6d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # ---------------- SESSION SUMMARY COLUMNS ----------------
+    for table in ('chat_sessions', 'tutor_sessions'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('summary', sa.Text(), nullable=True))
+            batch_op.add_column(sa.Column('summary_upto', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+
+    for table in ('chat_sessions', 'tutor_sessions'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('summary_upto')
+            batch_op.drop_column('summary')
@@ -0,0 +1,34 @@
+"""add groq rate buckets table
+
+Revision ID: 9a3f61c2d8e5
+Revises: 4b7e2d91c0a3
+Create Date: 2026-10-18 10:02:17.554930
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9a3f61c2d8e5'
+down_revision = '4b7e2d91c0a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # ---------------- GROQ RATE BUCKETS TABLE ----------------
+    op.create_table(
+        'groq_rate_buckets',
+        sa.Column('name', sa.String(length=150), nullable=False),
+        sa.Column('capacity', sa.Float(), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('refill_per_sec', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+
+    op.drop_table('groq_rate_buckets')
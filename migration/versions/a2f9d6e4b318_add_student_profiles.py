@@ -0,0 +1,49 @@
+"""add student profiles, index and fk on student progress
+
+Revision ID: a2f9d6e4b318
+Revises: 5c8e1d3b7f40
+Create Date: 2026-10-18 13:21:56.630148
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a2f9d6e4b318'
+down_revision = '5c8e1d3b7f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # ---------------- STUDENT PROGRESS ACCESS PATH ----------------
+    with op.batch_alter_table('student_progress', schema=None) as batch_op:
+        batch_op.create_index('ix_student_progress_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+    # NOT VALID: enforce for new rows without failing on old orphans
+    op.execute(
+        'ALTER TABLE student_progress '
+        'ADD CONSTRAINT student_progress_user_id_fkey '
+        'FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE NOT VALID'
+    )
+
+    # ---------------- STUDENT PROFILES TABLE ----------------
+    op.create_table(
+        'student_profiles',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('recent_topics', sa.Text(), server_default='[]', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+
+    op.drop_table('student_profiles')
+
+    op.drop_constraint('student_progress_user_id_fkey', 'student_progress', type_='foreignkey')
+
+    with op.batch_alter_table('student_progress', schema=None) as batch_op:
+        batch_op.drop_index('ix_student_progress_user_id_created_at')
@@ -0,0 +1,34 @@
+"""add usage counters table
+
+Revision ID: b6d03f5a9c27
+Revises: a2f9d6e4b318
+Create Date: 2026-10-18 13:58:12.281907
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b6d03f5a9c27'
+down_revision = 'a2f9d6e4b318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # ---------------- USAGE COUNTERS TABLE ----------------
+    op.create_table(
+        'usage_counters',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('feature', sa.String(length=30), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('used', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'feature', 'day')
+    )
+
+
+def downgrade():
+
+    op.drop_table('usage_counters')
@@ -0,0 +1,54 @@
+"""add jobs table
+
+Revision ID: d41c7a9e5b12
+Revises: 9a3f61c2d8e5
+Create Date: 2026-10-18 11:24:40.118302
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd41c7a9e5b12'
+down_revision = '9a3f61c2d8e5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # ---------------- JOBS TABLE ----------------
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), server_default='queued', nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('input_blob', sa.LargeBinary(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('result_blob', sa.LargeBinary(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('max_attempts', sa.Integer(), server_default='3', nullable=False),
+        sa.Column('run_after', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+        sa.Column('locked_by', sa.String(length=100), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('created', sa.DateTime(), server_default=sa.text('NOW()'), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_jobs_user_id'), ['user_id'], unique=False)
+        batch_op.create_index('ix_jobs_status_run_after', ['status', 'run_after'], unique=False)
+
+
+def downgrade():
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_jobs_status_run_after')
+        batch_op.drop_index(batch_op.f('ix_jobs_user_id'))
+
+    op.drop_table('jobs')
@@ -0,0 +1,30 @@
+"""add tutor message indexes
+
+Revision ID: e7b2c4f81a6d
+Revises: d41c7a9e5b12
+Create Date: 2026-10-18 12:10:05.402871
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c4f81a6d'
+down_revision = 'd41c7a9e5b12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # ---------------- TUTOR MESSAGE INDEXES ----------------
+    with op.batch_alter_table('tutor_messages', schema=None) as batch_op:
+        batch_op.create_index('ix_tutor_messages_session_id_id', ['session_id', 'id'], unique=False)
+        batch_op.create_index('ix_tutor_messages_user_id_created', ['user_id', 'created'], unique=False)
+
+
+def downgrade():
+
+    with op.batch_alter_table('tutor_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_tutor_messages_user_id_created')
+        batch_op.drop_index('ix_tutor_messages_session_id_id')
@@ -88,6 +88,10 @@ class ChatSession(db.Model):
 
     title = db.Column(db.String(200))
 
+    # Rolling summary of every chat up to and including summary_upto
+    summary = db.Column(db.Text, nullable=True)
+    summary_upto = db.Column(db.Integer, default=0, nullable=False)
+
     created = db.Column(db.DateTime, default=datetime.utcnow)
 
 
@@ -132,12 +136,21 @@ class TutorSession(db.Model):
 
     title = db.Column(db.String(200))
 
+    # Rolling summary of every message up to and including summary_upto
+    summary = db.Column(db.Text, nullable=True)
+    summary_upto = db.Column(db.Integer, default=0, nullable=False)
+
     created = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 # ---------------- TUTOR MESSAGE MODEL ----------------
 class TutorMessage(db.Model):
     __tablename__ = "tutor_messages"
+    __table_args__ = (
+        # Recent-window history load and the daily free-limit count
+        db.Index("ix_tutor_messages_session_id_id", "session_id", "id"),
+        db.Index("ix_tutor_messages_user_id_created", "user_id", "created"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -154,9 +167,14 @@ class TutorMessage(db.Model):
 
 # ---------------- STUDENT PROGRESS MODEL ----------------
 class StudentProgress(db.Model):
+    __table_args__ = (
+        # Newest-first history per student
+        db.Index("ix_student_progress_user_id_created_at", "user_id", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
 
-    user_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"))
     topic = db.Column(db.String(300))
     difficulty = db.Column(db.String(50))
     notes = db.Column(db.Text)
@@ -165,3 +183,110 @@ class StudentProgress(db.Model):
     language = db.Column(db.String(10))
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# ---------------- STUDENT PROFILE MODEL ----------------
+class StudentProfile(db.Model):
+    __tablename__ = "student_profiles"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    # JSON list, newest first: [{"topic", "language", "difficulty", "at"}, ...]
+    recent_topics = db.Column(db.Text, default="[]", nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+# ---------------- DAILY USAGE COUNTER MODEL ----------------
+class UsageCounter(db.Model):
+    __tablename__ = "usage_counters"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+
+    # "notes", "chat", "tutor"
+    feature = db.Column(db.String(30), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+
+    used = db.Column(db.Integer, default=0, nullable=False)
+
+
+# ---------------- LLM RESPONSE CACHE MODEL ----------------
+class LLMCacheEntry(db.Model):
+    __tablename__ = "llm_cache"
+
+    # sha256 of normalized prompt + model + temperature + max_tokens
+    key = db.Column(db.String(64), primary_key=True)
+
+    model = db.Column(db.String(100), nullable=False)
+    response = db.Column(db.Text, nullable=False)
+
+    hits = db.Column(db.Integer, default=0, nullable=False)
+
+    created = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+# ---------------- OCR RESULT CACHE MODEL ----------------
+class OCRCacheEntry(db.Model):
+    __tablename__ = "ocr_cache"
+
+    # "<lang>:raw:<sha256 of the upload>" or "<lang>:dhash:<sha256 of its perceptual hash>"
+    key = db.Column(db.String(120), primary_key=True)
+
+    text = db.Column(db.Text, nullable=False)
+
+    hits = db.Column(db.Integer, default=0, nullable=False)
+
+    created = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+# ---------------- GROQ RATE LIMIT BUCKET MODEL ----------------
+class RateBucket(db.Model):
+    __tablename__ = "groq_rate_buckets"
+
+    # e.g. "rpm:llama-3.1-8b-instant" / "tpm:llama-3.1-8b-instant"
+    name = db.Column(db.String(150), primary_key=True)
+
+    capacity = db.Column(db.Float, nullable=False)
+    tokens = db.Column(db.Float, nullable=False)
+    refill_per_sec = db.Column(db.Float, nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+# ---------------- BACKGROUND JOB MODEL ----------------
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Claim query: oldest runnable job first
+        db.Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+
+    # e.g. "notes.generate", "notes.image", "notes.pdf", "tutor.image"
+    kind = db.Column(db.String(50), nullable=False)
+
+    # queued -> running -> succeeded | failed
+    status = db.Column(db.String(20), default="queued", nullable=False)
+
+    payload = db.Column(db.Text, nullable=False)        # JSON arguments
+    input_blob = db.Column(db.LargeBinary, nullable=True)   # uploaded image etc.
+
+    result = db.Column(db.Text, nullable=True)          # JSON result
+    result_blob = db.Column(db.LargeBinary, nullable=True)  # rendered PDF etc.
+    error = db.Column(db.Text, nullable=True)
+
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=3, nullable=False)
+
+    run_after = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+
+    created = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
@@ -1,22 +1,22 @@
-from flask import Blueprint, render_template, session, redirect, request, Response
+from flask import Blueprint, render_template, session, redirect, request, Response, stream_with_context
 from datetime import date
-import io
 
 from models_pg import db, Note
 from utils.db_helpers import get_user_plan, is_admin, get_usage
-from ai.notes import generate_notes_with_groq
-from notes.utils import clean_html
+from ai.notes import generate_notes_with_groq, paste_deadline
+from notes.utils import clean_html, render_note_pdf
 from utils.security import verify_csrf
+from jobs.queue import wants_async, enqueue, accepted
+from utils.quota import reserve
+from ai.groq import is_error_chunk
+from ocr.engine import extract_text, pack_uploads, OCRError
 
-from reportlab.platypus import SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
-
-from PIL import Image
-import pytesseract
 from flask import current_app
 notes_bp = Blueprint("notes", __name__)
 
+# How long a streamed note may take before the browser gives up on it
+NOTES_STREAM_DEADLINE = 45
+
 
 @notes_bp.route("/dashboard")
 def dashboard():
@@ -64,50 +64,100 @@ def generate_stream():
     class_level = request.form.get("class_level", "")
     subject = request.form.get("subject", "")
 
-    # FREE LIMIT CHECK
-    if plan == "free" and not is_admin():
-        today_count = Note.query.filter_by(
-            user_id=user_id,
-            created=date.today()
-        ).count()
-
-        if today_count >= 5:
-            return "Daily free limit reached. Upgrade to Pro.", 403
+    limited = plan == "free" and not is_admin()
 
     # MCQ MODE – PRO ONLY
-    if mode == "mcq" and plan == "free" and not is_admin():
+    if mode == "mcq" and limited:
         return "MCQ mode is Pro only. Upgrade to unlock.", 403
 
+    if not lesson.strip():
+        return "Please enter a valid topic.", 400
+
+    # FREE LIMIT CHECK (atomic; refunded below if generation fails)
+    reservation = reserve(user_id, "notes", limited=limited)
+
+    if reservation is None:
+        return "Daily free limit reached. Upgrade to Pro.", 403
+
+    # Opt-in, or a paste too long for the rate limits to note within the
+    # stream deadline: hand the work to the job workers and return at once
+    needed = paste_deadline(lesson, mode, user_prompt, plan)
+
+    if wants_async() or (needed and needed > NOTES_STREAM_DEADLINE):
+        job = enqueue("notes.generate", {
+            "lesson": lesson,
+            "mode": mode,
+            "user_prompt": user_prompt,
+            "board": board,
+            "class_level": class_level,
+            "subject": subject,
+            "plan": plan,
+            "quota": reservation.to_dict()
+        }, user_id=user_id)
+
+        return accepted(job)
+
     try:
-        output = generate_notes_with_groq(
+        chunks = generate_notes_with_groq(
             lesson=lesson,
             mode=mode,
             user_prompt=user_prompt,
             board=board,
             class_level=class_level,
             subject=subject,
-            plan=plan
+            plan=plan,
+            stream=True,
+            deadline=NOTES_STREAM_DEADLINE
         )
     except Exception:
       current_app.logger.exception("Groq API failed in generate_stream")
+      reservation.refund()
       return "AI service temporarily unavailable. Please try again.", 500
 
+    def generate():
+        parts = []
+        saved = False
 
-    try:
-        new_note = Note(
-            user_id=user_id,
-            lesson=lesson,
-            content=output,
-            created=date.today()
-        )
+        failed = False
 
-        db.session.add(new_note)
-        db.session.commit()
-    except Exception as e:
-        print("DB Error:", str(e))
-        return "Failed to save note in database", 500
+        try:
+            for chunk in chunks:
+                failed = failed or is_error_chunk(chunk)
+                parts.append(chunk)
+                yield chunk
+
+            content = "".join(parts)
 
-    return Response(output, mimetype="text/plain")
+            # Save the completed note once the stream has finished
+            if content.strip() and not failed:
+                new_note = Note(
+                    user_id=user_id,
+                    lesson=lesson,
+                    content=content,
+                    created=date.today()
+                )
+
+                db.session.add(new_note)
+                db.session.commit()
+                saved = True
+
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception("Error finishing streamed note")
+
+        finally:
+            # Failed, empty or abandoned generations do not use up quota
+            if not saved:
+                reservation.refund()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
 
 @notes_bp.route("/note/<int:note_id>")
@@ -171,23 +221,12 @@ def download(note_id):
     if not note:
         return "Note not found", 404
 
-    buf = io.BytesIO()
-    pdf = SimpleDocTemplate(buf, pagesize=A4)
-    styles = getSampleStyleSheet()
-
-    story = [Paragraph(note.lesson, styles["Title"])]
-
-    clean_pdf = clean_html(note.content)
-
-    for line in clean_pdf.split("\n"):
-        story.append(Paragraph(line, styles["Normal"]))
-
-    pdf.build(story)
-
-    buf.seek(0)
+    if wants_async():
+        job = enqueue("notes.pdf", {"note_id": note.id}, user_id=session["user_id"])
+        return accepted(job)
 
     return Response(
-        buf,
+        render_note_pdf(note.lesson, note.content),
         mimetype="application/pdf",
         headers={
             "Content-Disposition": f"attachment;filename={note.lesson}.pdf"
@@ -251,12 +290,23 @@ def generate_from_image():
     if "image" not in request.files:
         return "No image uploaded", 400
 
-    file = request.files["image"]
+    # Photos and/or PDFs; every page is read, in upload order
+    uploads = [file.read() for file in request.files.getlist("image")]
 
-    try:
-        img = Image.open(file)
+    if wants_async():
+        job = enqueue("notes.image", {
+            "mode": request.form.get("mode", "board"),
+            "board": request.form.get("board", ""),
+            "class_level": request.form.get("class_level", ""),
+            "subject": request.form.get("subject", ""),
+            "plan": get_user_plan(session["user_id"]),
+            "bundle": len(uploads) > 1
+        }, user_id=session["user_id"], input_blob=pack_uploads(uploads) if len(uploads) > 1 else uploads[0])
+
+        return accepted(job)
 
-        extracted_text = pytesseract.image_to_string(img, lang="eng")
+    try:
+        extracted_text = extract_text(uploads)
 
         if not extracted_text.strip():
             return "Could not detect readable text in the image.", 400
@@ -269,11 +319,15 @@ def generate_from_image():
             board=request.form.get("board", ""),
             class_level=request.form.get("class_level", ""),
             subject=request.form.get("subject", ""),
-            plan=get_user_plan(session["user_id"])
+            plan=get_user_plan(session["user_id"]),
+            deadline=45
         )
 
         return Response(output, mimetype="text/plain")
 
+    except OCRError as e:
+        return str(e), 400
+
     except Exception as e:
         print("OCR Error:", str(e))
         return "Error processing image", 500
@@ -1,5 +1,11 @@
 import re
 import html
+import io
+
+from reportlab.platypus import SimpleDocTemplate, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.pagesizes import A4
+
 
 def clean_html(text):
     if not text:
@@ -10,3 +16,23 @@ def clean_html(text):
 
     lines = [line.strip() for line in text.splitlines() if line.strip()]
     return '\n'.join(lines)
+
+
+def render_note_pdf(lesson, content):
+    """
+    Render a note as an A4 PDF and return the bytes.
+    """
+    buf = io.BytesIO()
+    pdf = SimpleDocTemplate(buf, pagesize=A4)
+    styles = getSampleStyleSheet()
+
+    story = [Paragraph(lesson, styles["Title"])]
+
+    clean_pdf = clean_html(content)
+
+    for line in clean_pdf.split("\n"):
+        story.append(Paragraph(line, styles["Normal"]))
+
+    pdf.build(story)
+
+    return buf.getvalue()
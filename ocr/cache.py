@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+from datetime import datetime
+
+from flask import has_app_context
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from ai.cache import LRUCache
+from models_pg import db, OCRCacheEntry
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- SETTINGS ----------------
+# Students re-upload the same textbook pages and worksheets. Extracted
+# text is cached per worker (LRU) and in Postgres (shared by all workers),
+# keyed by the upload bytes and by a perceptual hash of the picture
+# (see ocr/keys.py).
+
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+OCR_CACHE_LOCAL_SIZE = int(os.getenv("OCR_CACHE_LOCAL_SIZE", "256"))
+OCR_CACHE_DB_MAX_ROWS = int(os.getenv("OCR_CACHE_DB_MAX_ROWS", "20000"))
+
+# The text of an image never goes stale; entries leave by LRU eviction
+OCR_CACHE_TTL = 30 * 24 * 3600
+
+# Trim the shared table once every N stores per worker
+PRUNE_EVERY = 50
+
+
+# ---------------- TWO-TIER CACHE ----------------
+class OCRCache:
+
+    def __init__(self):
+        self.local = LRUCache(OCR_CACHE_LOCAL_SIZE, OCR_CACHE_TTL)
+        self._stats_lock = threading.Lock()
+        self._stores = 0
+        self.counters = {
+            "local_hits": 0,
+            "db_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0
+        }
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            data = dict(self.counters)
+
+        data["local_size"] = len(self.local)
+        return data
+
+    def get(self, key):
+        if not OCR_CACHE_ENABLED:
+            return None
+
+        text = self.local.get(key)
+
+        if text is not None:
+            self._count("local_hits")
+            return text
+
+        text = self._db_get(key)
+
+        if text is not None:
+            self._count("db_hits")
+            self._count("evictions", self.local.put(key, text))
+            return text
+
+        self._count("misses")
+        return None
+
+    def put(self, key, text):
+        if not OCR_CACHE_ENABLED or not text.strip():
+            return
+
+        self._count("evictions", self.local.put(key, text))
+        self._count("stores")
+        self._db_put(key, text)
+
+    # ----- POSTGRES TIER -----
+
+    def _db_get(self, key):
+        if not has_app_context():
+            return None
+
+        table = OCRCacheEntry.__table__
+
+        try:
+            with db.engine.begin() as conn:
+                row = conn.execute(
+                    table.update()
+                    .where(table.c.key == key)
+                    .values(hits=table.c.hits + 1, last_used=datetime.utcnow())
+                    .returning(table.c.text)
+                ).first()
+        except Exception:
+            self._count("errors")
+            logger.exception("OCR cache read failed")
+            return None
+
+        return row[0] if row else None
+
+    def _db_put(self, key, text):
+        if not has_app_context():
+            return
+
+        table = OCRCacheEntry.__table__
+        now = datetime.utcnow()
+
+        stmt = insert(table).values(key=key, text=text, hits=0, created=now, last_used=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={"text": stmt.excluded.text, "last_used": stmt.excluded.last_used}
+        )
+
+        with self._stats_lock:
+            self._stores += 1
+            prune = self._stores % PRUNE_EVERY == 0
+
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(stmt)
+
+                if prune:
+                    self._db_prune(conn)
+        except Exception:
+            self._count("errors")
+            logger.exception("OCR cache write failed")
+
+    def _db_prune(self, conn):
+        table = OCRCacheEntry.__table__
+
+        # Size bound: keep only the most recently used rows
+        stale = (
+            select(table.c.key)
+            .order_by(table.c.last_used.desc())
+            .offset(OCR_CACHE_DB_MAX_ROWS)
+        )
+        result = conn.execute(table.delete().where(table.c.key.in_(stale)))
+
+        if result.rowcount:
+            self._count("evictions", result.rowcount)
+
+
+ocr_cache = OCRCache()
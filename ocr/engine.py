@@ -0,0 +1,700 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app, has_app_context
+
+from ai.metrics import Counter, Histogram, register
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- SETTINGS ----------------
+# Tesseract runs in a small pool of worker processes so a 12 MP phone
+# photo never blocks a web thread (or the GIL) while it is recognized.
+
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "")
+
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Requests allowed to wait for a free worker; beyond this we answer "busy"
+OCR_QUEUE = int(os.getenv("OCR_QUEUE", "8"))
+OCR_QUEUE_WAIT = float(os.getenv("OCR_QUEUE_WAIT", "10"))
+
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "30"))
+
+# Upload guards: compressed bytes and decoded pixels (decompression bombs)
+OCR_MAX_BYTES = int(os.getenv("OCR_MAX_BYTES", str(10 * 1024 * 1024)))
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", str(40_000_000)))
+
+# Phone photos carry no trustworthy DPI. A long side of ~2400 px is an A4
+# page at ~200 DPI, where Tesseract accuracy on printed text levels off;
+# bigger only costs time, smaller screenshots are upscaled.
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "2400"))
+OCR_MIN_SIDE = int(os.getenv("OCR_MIN_SIDE", "1000"))
+
+# "otsu" binarizes before recognition, "none" leaves it to Tesseract
+OCR_THRESHOLD = os.getenv("OCR_THRESHOLD", "otsu").lower()
+
+# ---------------- PAGES AND LANGUAGES ----------------
+# PDFs and image batches are split into pages that are recognized in
+# parallel. A PDF's pages go out in runs, so each pool process gets the
+# document once per run instead of once per page.
+
+OCR_MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", "30"))
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "200"))
+
+# PDF pages with at least this much embedded text skip OCR altogether
+OCR_PDF_TEXT_MIN_CHARS = 50
+
+# Language used when script detection is unsure or its model is missing
+OCR_DEFAULT_LANG = os.getenv("OCR_DEFAULT_LANG", "eng")
+
+# Tesseract OSD script -> language models. Indian textbooks mix in
+# English terms, so other scripts are read together with "eng".
+SCRIPT_LANGS = {
+    "Latin": "eng",
+    "Devanagari": "hin+eng",
+    "Kannada": "kan+eng"
+}
+
+OSD_MIN_SCRIPT_CONF = 1.0
+OSD_MIN_ORIENTATION_CONF = 2.0
+
+STAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+ocr_stage_seconds = register(Histogram(
+    "ocr_stage_seconds",
+    "Time spent per OCR stage (cache, queue, hash, decode, preprocess, detect, recognize).",
+    labels=("stage",),
+    buckets=STAGE_BUCKETS
+))
+
+ocr_requests = register(Counter(
+    "ocr_requests_total",
+    "OCR page requests by outcome.",
+    labels=("outcome",)
+))
+
+ocr_pages = register(Counter(
+    "ocr_pages_total",
+    "Pages recognized, by language model used.",
+    labels=("lang",)
+))
+
+
+class OCRError(Exception):
+    """
+    OCR could not run on this upload; the message is safe to show the user.
+    """
+
+
+# ---------------- PRE-PROCESSING ----------------
+# Everything below runs inside the pool processes.
+
+_installed_langs = None
+
+
+def _init_worker(tesseract_cmd):
+    global _installed_langs
+
+    import pytesseract
+    from PIL import Image
+
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    # We check pixel counts ourselves before decoding
+    Image.MAX_IMAGE_PIXELS = None
+
+    try:
+        _installed_langs = set(pytesseract.get_languages(config=""))
+    except Exception:
+        _installed_langs = None
+
+
+def _available(lang):
+    # Unknown install (listing failed): let tesseract decide
+    if _installed_langs is None:
+        return True
+
+    return all(part in _installed_langs for part in lang.split("+"))
+
+
+def _otsu_level(histogram):
+    """
+    Threshold that best separates ink from paper in a 256-bin histogram.
+    """
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+
+    best_level, best_variance = 127, -1.0
+    background, weighted_background = 0, 0
+
+    for level, count in enumerate(histogram):
+        background += count
+
+        if background == 0:
+            continue
+
+        foreground = total - background
+
+        if foreground == 0:
+            break
+
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+
+    return best_level
+
+
+def _open(blob):
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        img = Image.open(io.BytesIO(blob))
+    except UnidentifiedImageError:
+        raise OCRError("Unsupported image format. Please upload a JPG or PNG photo.")
+    except Image.DecompressionBombError:
+        raise OCRError("Image resolution is too large. Please upload a smaller photo.")
+
+    # Header only so far: refuse bombs before any pixel is decoded
+    width, height = img.size
+
+    if width * height > OCR_MAX_PIXELS:
+        raise OCRError("Image resolution is too large. Please upload a smaller photo.")
+
+    return img
+
+
+def _decode(img):
+    long_side = max(img.size)
+
+    if img.format == "JPEG" and long_side > OCR_MAX_SIDE:
+        # Let libjpeg decode straight to grayscale at 1/2, 1/4 or 1/8 scale
+        scale = OCR_MAX_SIDE / long_side
+        img.draft("L", (int(img.width * scale), int(img.height * scale)))
+
+    img.load()
+    return img
+
+
+def preprocess(img):
+    """
+    Upright, grayscale, OCR-sized and (optionally) binarized copy of img.
+    """
+    from PIL import Image, ImageOps
+
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode in ("RGBA", "LA", "P"):
+        # Transparent screenshots: flatten onto white, not black
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img)
+
+    img = img.convert("L")
+
+    long_side = max(img.size)
+
+    if long_side > OCR_MAX_SIDE or long_side < OCR_MIN_SIDE:
+        target = OCR_MAX_SIDE if long_side > OCR_MAX_SIDE else OCR_MIN_SIDE
+        scale = target / long_side
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.LANCZOS)
+
+    img = ImageOps.autocontrast(img, cutoff=1)
+
+    if OCR_THRESHOLD == "otsu":
+        level = _otsu_level(img.histogram())
+        img = img.point(lambda value: 255 if value > level else 0)
+
+    return img
+
+
+def detect_language(img):
+    """
+    Tesseract language for a preprocessed page, from orientation and
+    script detection (OSD). Returns (lang, degrees to rotate clockwise).
+    """
+    import pytesseract
+
+    try:
+        osd = pytesseract.image_to_osd(img, output_type=pytesseract.Output.DICT, timeout=OCR_TIMEOUT)
+    except Exception:
+        # Too little text for OSD, or the osd model is not installed
+        return OCR_DEFAULT_LANG, 0
+
+    lang = SCRIPT_LANGS.get(osd.get("script"), OCR_DEFAULT_LANG)
+
+    if osd.get("script_conf", 0) < OSD_MIN_SCRIPT_CONF or not _available(lang):
+        lang = OCR_DEFAULT_LANG
+
+    rotate = osd.get("rotate", 0) if osd.get("orientation_conf", 0) >= OSD_MIN_ORIENTATION_CONF else 0
+
+    return lang, rotate
+
+
+def _render_pdf_page(pdf, index):
+    """
+    (embedded text, None) when the page has a text layer, else (None, grayscale image).
+    """
+    page = pdf[index]
+    text = page.get_textpage().get_text_range()
+
+    if len(text.strip()) >= OCR_PDF_TEXT_MIN_CHARS:
+        return text, None
+
+    width, height = page.get_size()
+    scale = OCR_PDF_DPI / 72
+
+    # Same pixel budget as photos, whatever the page size
+    if width * height * scale * scale > OCR_MAX_PIXELS:
+        scale = (OCR_MAX_PIXELS / (width * height)) ** 0.5
+
+    return None, page.render(scale=scale, grayscale=True).to_pil()
+
+
+def _read(img, lang, timings):
+    """
+    Preprocess and recognize one decoded page; stage times go into
+    timings. Returns (text, lang used).
+    """
+    import pytesseract
+
+    started = time.perf_counter()
+    img = preprocess(img)
+    timings["preprocess"] = time.perf_counter() - started
+
+    if lang == "auto":
+        started = time.perf_counter()
+        lang, rotate = detect_language(img)
+
+        if rotate:
+            img = img.rotate(-rotate, expand=True, fillcolor=255)
+
+        timings["detect"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+
+    try:
+        text = pytesseract.image_to_string(img, lang=lang, timeout=OCR_TIMEOUT)
+    except RuntimeError:
+        # pytesseract kills the tesseract process on timeout
+        raise OCRError("Reading the image took too long. Please try a clearer or smaller photo.")
+
+    timings["recognize"] = time.perf_counter() - started
+
+    return text, lang
+
+
+def _recognize(blob, lang):
+    """
+    Pool entry point for an image: returns (text, {stage: seconds}, lang used).
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    img = _decode(_open(blob))
+    timings["decode"] = time.perf_counter() - started
+
+    text, lang = _read(img, lang, timings)
+
+    return text, timings, lang
+
+
+def _recognize_pdf(blob, lang, pages):
+    """
+    Pool entry point for a run of PDF pages: the document is opened once
+    and (text, {stage: seconds}, lang used) returned per page, in order.
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(blob)
+    results = []
+
+    try:
+        for index in pages:
+            timings = {}
+
+            started = time.perf_counter()
+            text, img = _render_pdf_page(pdf, index)
+            timings["decode"] = time.perf_counter() - started
+
+            if text is not None:
+                results.append((text, timings, "pdf-text"))
+                continue
+
+            text, used_lang = _read(img, lang, timings)
+            results.append((text, timings, used_lang))
+
+    finally:
+        pdf.close()
+
+    return results
+
+
+def _image_key(blob, lang):
+    """
+    Pool entry point: perceptual cache key of an image, or None if it
+    cannot be hashed. Non-JPEG pictures are decoded in full for it.
+    """
+    from ocr.keys import perceptual_key
+
+    try:
+        return perceptual_key(_open(blob), lang)
+    except OCRError:
+        raise
+    except Exception:
+        return None
+
+
+# ---------------- POOL ----------------
+
+_lock = threading.Lock()
+_pool = None
+_slots = threading.BoundedSemaphore(max(1, OCR_WORKERS) + OCR_QUEUE)
+
+
+def _get_pool():
+    # Created lazily so each forked web worker gets its own processes
+    global _pool
+
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                # spawn: never fork a threaded web worker
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(TESSERACT_CMD,)
+            )
+
+        return _pool
+
+
+def _reset_pool(pool):
+    global _pool
+
+    with _lock:
+        if _pool is pool:
+            _pool = None
+
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args, size=1):
+    """
+    fn(*args) in the pool; size is the number of pages it reads.
+    """
+    if OCR_WORKERS <= 0:
+        if _installed_langs is None:
+            _init_worker(TESSERACT_CMD)
+
+        return fn(*args)
+
+    pool = _get_pool()
+
+    try:
+        future = pool.submit(fn, *args)
+        # Extra seconds cover waiting behind other images in the pool
+        return future.result(timeout=OCR_TIMEOUT * (size + 1))
+
+    except FutureTimeout:
+        raise OCRError("Reading the image took too long. Please try a clearer or smaller photo.")
+
+    except BrokenProcessPool:
+        logger.exception("OCR worker died; restarting the pool")
+        _reset_pool(pool)
+        raise OCRError("Could not read the image. Please try again.")
+
+
+@contextmanager
+def _pool_slot():
+    # A place in the pool or its short queue, else "busy"
+    if not _slots.acquire(timeout=OCR_QUEUE_WAIT):
+        ocr_requests.inc(outcome="busy")
+        raise OCRError("Image reading is busy right now. Please try again in a moment.")
+
+    try:
+        yield
+
+    except OCRError:
+        ocr_requests.inc(outcome="error")
+        raise
+
+    finally:
+        _slots.release()
+
+
+# ---------------- CACHE ----------------
+
+def _cached(key):
+    # Imported here: keeps the spawned OCR processes free of the app and database stack
+    from ocr.cache import ocr_cache
+
+    started = time.perf_counter()
+    text = ocr_cache.get(key)
+    ocr_stage_seconds.observe(time.perf_counter() - started, stage="cache")
+
+    return text
+
+
+def _cache_store(keys, text):
+    from ocr.cache import ocr_cache
+
+    for key in keys:
+        ocr_cache.put(key, text)
+
+
+def _record(results, keys, total, label):
+    """
+    Metrics, cache entries and a log line for pages read by one pool
+    call. Returns their texts.
+    """
+    stages = {}
+
+    for text, timings, used_lang in results:
+        for stage, seconds in timings.items():
+            ocr_stage_seconds.observe(seconds, stage=stage)
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+        ocr_requests.inc(outcome="ok")
+        ocr_pages.inc(lang=used_lang)
+
+    # Time not spent in any stage was spent waiting for the pool
+    stages["queue"] = max(0.0, total - sum(stages.values()))
+    ocr_stage_seconds.observe(stages["queue"], stage="queue")
+
+    for (text, _, _), page_keys in zip(results, keys):
+        _cache_store(page_keys, text)
+
+    logger.info(
+        "OCR %s as %s in %.2fs (%s)", label,
+        "/".join(sorted({used_lang for _, _, used_lang in results})), total,
+        ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in stages.items())
+    )
+
+    return [text for text, _, _ in results]
+
+
+# ---------------- PAGES ----------------
+
+def _ocr_image(blob, lang):
+    """
+    Text of one image upload, from the cache or the pool.
+    """
+    from ocr.keys import raw_key
+
+    keys = [raw_key(blob, lang)]
+    text = _cached(keys[0])
+
+    if text is not None:
+        ocr_requests.inc(outcome="cached")
+        return text
+
+    queued = time.perf_counter()
+
+    with _pool_slot():
+        # Hashing decodes the picture, so it runs in the pool as well
+        started = time.perf_counter()
+        key = _run(_image_key, blob, lang)
+        hashed = time.perf_counter() - started
+
+        if key is None:
+            logger.warning("Could not hash image for the OCR cache")
+        else:
+            keys.append(key)
+            text = _cached(key)
+
+        if text is not None:
+            # The next byte-identical upload skips decoding entirely
+            _cache_store(keys[:1], text)
+            ocr_requests.inc(outcome="cached")
+            return text
+
+        result = _run(_recognize, blob, lang)
+
+    result[1]["hash"] = hashed
+
+    return _record([result], [keys], time.perf_counter() - queued, f"{len(blob)} bytes")[0]
+
+
+def _ocr_pdf_pages(blob, lang, pages, keys):
+    """
+    Text of a run of PDF pages, read by one pool process that gets the
+    document once for all of them.
+    """
+    queued = time.perf_counter()
+
+    with _pool_slot():
+        results = _run(_recognize_pdf, blob, lang, pages, size=len(pages))
+
+    label = f"{len(blob)} bytes pages {pages[0] + 1}-{pages[-1] + 1}"
+
+    return _record(results, [[keys[page]] for page in pages], time.perf_counter() - queued, label)
+
+
+def _cached_pdf_pages(blob, lang, count):
+    """
+    Cache keys of every page of a PDF and their cached text (None if missing).
+    """
+    from ocr.keys import raw_key
+
+    # The document is hashed once, not once per page
+    base = raw_key(blob, lang)
+    keys = [f"{base}:p{page}" for page in range(count)]
+
+    return keys, [_cached(key) for key in keys]
+
+
+def _runs(pages, count):
+    # Split pages into at most `count` consecutive runs of similar length
+    size = -(-len(pages) // count)
+    return [pages[start:start + size] for start in range(0, len(pages), size)]
+
+
+# ---------------- PUBLIC API ----------------
+
+def is_pdf(blob):
+    return blob[:5] == b"%PDF-"
+
+
+def pdf_page_count(blob):
+    import pypdfium2 as pdfium
+
+    try:
+        pdf = pdfium.PdfDocument(blob)
+    except pdfium.PdfiumError:
+        raise OCRError("Could not open the PDF. Please upload a valid file.")
+
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _uploads(blobs):
+    # [(blob, PDF page count or None for an image), ...] in upload order
+    uploads, total = [], 0
+
+    for blob in blobs:
+        if not blob:
+            continue
+
+        if len(blob) > OCR_MAX_BYTES:
+            ocr_requests.inc(outcome="rejected")
+            raise OCRError(f"File is too large (max {OCR_MAX_BYTES // (1024 * 1024)} MB).")
+
+        count = pdf_page_count(blob) if is_pdf(blob) else None
+        uploads.append((blob, count))
+        total += 1 if count is None else count
+
+        if total > OCR_MAX_PAGES:
+            ocr_requests.inc(outcome="rejected")
+            raise OCRError(f"Too many pages (max {OCR_MAX_PAGES}). Please upload one chapter at a time.")
+
+    if not total:
+        raise OCRError("No image uploaded.")
+
+    return uploads
+
+
+def pack_uploads(blobs):
+    """
+    A batch of uploads as one blob (an uncompressed ZIP), e.g. for a job.
+    """
+    buffer = io.BytesIO()
+
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        for index, blob in enumerate(blobs):
+            archive.writestr(f"{index:03d}", blob)
+
+    return buffer.getvalue()
+
+
+def unpack_uploads(blob):
+    with zipfile.ZipFile(io.BytesIO(blob)) as archive:
+        return [archive.read(name) for name in sorted(archive.namelist())]
+
+
+def extract_pages(blobs, lang="auto"):
+    """
+    Text of every page in a batch of uploads (images and/or PDFs), in
+    upload order. Pages are recognized in parallel; lang="auto" detects
+    the script of each page. Raises OCRError with a user-facing message.
+    """
+    texts = []
+    jobs = []
+
+    # One job per image; a PDF's uncached pages in up to OCR_WORKERS runs
+    for index, (blob, count) in enumerate(_uploads(blobs)):
+        if count is None:
+            texts.append([None])
+            jobs.append((index, None, _ocr_image, (blob, lang)))
+            continue
+
+        keys, found = _cached_pdf_pages(blob, lang, count)
+        missing = [page for page, text in enumerate(found) if text is None]
+        texts.append(found)
+
+        if count > len(missing):
+            ocr_requests.inc(count - len(missing), outcome="cached")
+
+        for pages in _runs(missing, max(1, OCR_WORKERS)) if missing else []:
+            jobs.append((index, pages, _ocr_pdf_pages, (blob, lang, pages, keys)))
+
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def run(job):
+        _, _, fn, args = job
+
+        if app is None:
+            return fn(*args)
+
+        with app.app_context():
+            return fn(*args)
+
+    if len(jobs) <= 1:
+        results = [run(job) for job in jobs]
+    else:
+        # Threads only wait on the process pool; one per pool process
+        workers = max(1, min(OCR_WORKERS, len(jobs)))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, jobs))
+
+    for (index, pages, _, _), result in zip(jobs, results):
+        if pages is None:
+            texts[index][0] = result
+        else:
+            for page, text in zip(pages, result):
+                texts[index][page] = text
+
+    return [text for upload in texts for text in upload]
+
+
+def extract_text(blobs, lang="auto"):
+    """
+    All text from one upload (bytes) or a batch of them, pages joined in
+    order. Raises OCRError with a user-facing message.
+    """
+    if isinstance(blobs, (bytes, bytearray)):
+        blobs = [blobs]
+
+    pages = extract_pages(blobs, lang)
+
+    return "\n\n".join(page.strip() for page in pages if page.strip())
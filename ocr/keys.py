@@ -0,0 +1,46 @@
+import hashlib
+import os
+
+
+# ---------------- OCR CACHE KEYS ----------------
+# Kept apart from ocr/cache.py so the spawned OCR processes, which compute
+# the perceptual key while they hold the decoded picture anyway, never
+# import the app and database stack.
+
+# Side of the difference-hash grid (bits = side * side). Large enough that
+# two pages of the same book differ, small enough that re-compressed or
+# resized copies of one photo still match.
+OCR_CACHE_HASH_SIZE = int(os.getenv("OCR_CACHE_HASH_SIZE", "32"))
+
+
+def raw_key(blob, lang):
+    """
+    Key for byte-identical uploads; needs no decoding.
+    """
+    return f"{lang}:raw:{hashlib.sha256(blob).hexdigest()}"
+
+
+def perceptual_key(img, lang, size=OCR_CACHE_HASH_SIZE):
+    """
+    Key for near-identical uploads: a difference hash (dHash) of a small
+    grayscale thumbnail plus the aspect ratio. img must be freshly opened.
+    """
+    from PIL import Image, ImageOps
+
+    # JPEG only: decode at 1/8 scale, the thumbnail needs no more
+    img.draft("L", (size * 4, size * 4))
+
+    img = ImageOps.exif_transpose(img).convert("L")
+    aspect = img.width / img.height
+
+    thumb = ImageOps.autocontrast(img.resize((size + 1, size), Image.LANCZOS))
+    pixels = thumb.tobytes()
+
+    bits = "".join(
+        "1" if pixels[row * (size + 1) + col] > pixels[row * (size + 1) + col + 1] else "0"
+        for row in range(size)
+        for col in range(size)
+    )
+
+    digest = hashlib.sha256(f"{aspect:.2f}:{bits}".encode()).hexdigest()
+    return f"{lang}:dhash:{digest}"
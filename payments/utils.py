@@ -9,13 +9,32 @@ load_dotenv()
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
-if not RAZORPAY_KEY_ID or not RAZORPAY_KEY_SECRET:
-    raise Exception("Razorpay keys not configured in .env file")
+# Optional API override, e.g. the load-test stand-in
+RAZORPAY_BASE_URL = os.getenv("RAZORPAY_BASE_URL")
 
-# Razorpay client
-razorpay_client = razorpay.Client(
-    auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET)
-)
+_razorpay_client = None
+
+
+# ---------------- CLIENT ----------------
+def get_razorpay_client():
+    """
+    Build the Razorpay client on first use so the app can boot
+    (and be benchmarked) without payment keys.
+    """
+    global _razorpay_client
+
+    if _razorpay_client is None:
+        if not RAZORPAY_KEY_ID or not RAZORPAY_KEY_SECRET:
+            raise Exception("Razorpay keys not configured in .env file")
+
+        options = {"base_url": RAZORPAY_BASE_URL} if RAZORPAY_BASE_URL else {}
+
+        _razorpay_client = razorpay.Client(
+            auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET),
+            **options
+        )
+
+    return _razorpay_client
 
 
 def get_razorpay_key():
@@ -31,7 +50,7 @@ def create_razorpay_order():
     if not user_id:
         raise Exception("No user in session for Razorpay order")
 
-    order = razorpay_client.order.create({
+    order = get_razorpay_client().order.create({
         "amount": 9900,   # ₹99 in paise
         "currency": "INR",
         "payment_capture": 1,
@@ -48,7 +67,7 @@ def create_razorpay_order():
 # ---------------- VERIFY SIGNATURE ----------------
 def verify_payment(payment_id, order_id, signature):
     try:
-        razorpay_client.utility.verify_payment_signature({
+        get_razorpay_client().utility.verify_payment_signature({
             "razorpay_payment_id": payment_id,
             "razorpay_order_id": order_id,
             "razorpay_signature": signature
@@ -1,4 +1,6 @@
 const CACHE_NAME = "salapa-v2";
+const AUDIO_CACHE = "salapa-audio-v1";
+const AUDIO_CACHE_ENTRIES = 150;
 const OFFLINE_URL = "/offline";
 
 self.addEventListener("install", event => {
@@ -9,7 +11,43 @@ self.addEventListener("install", event => {
   );
 });
 
+// Read-aloud audio is content-addressed by its URL: replay from cache
+async function storeAudio(cache, request, response) {
+  await cache.put(request, response);
+
+  // Keep the newest entries only
+  const keys = await cache.keys();
+  for (const old of keys.slice(0, Math.max(0, keys.length - AUDIO_CACHE_ENTRIES))) {
+    await cache.delete(old);
+  }
+}
+
+async function cachedAudio(event) {
+  const cache = await caches.open(AUDIO_CACHE);
+  const hit = await cache.match(event.request);
+
+  if (hit) return hit;
+
+  const response = await fetch(event.request);
+  const cacheControl = response.headers.get("Cache-Control") || "";
+
+  // Store in the background so playback starts with the first bytes;
+  // long texts arrive as a no-store stream and are cached on the next play
+  if (response.status === 200 && !cacheControl.includes("no-store")) {
+    event.waitUntil(storeAudio(cache, event.request, response.clone()).catch(() => {}));
+  }
+
+  return response;
+}
+
 self.addEventListener("fetch", event => {
+  const url = new URL(event.request.url);
+
+  if (event.request.method === "GET" && url.pathname === "/voice" && !event.request.headers.has("range")) {
+    event.respondWith(cachedAudio(event));
+    return;
+  }
+
   event.respondWith(
     fetch(event.request).catch(() =>
       caches.match(event.request)
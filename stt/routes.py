@@ -1,38 +1,29 @@
 from flask import Blueprint, request, jsonify
-from groq import Groq
-import os
-from dotenv import load_dotenv
 
-load_dotenv()
+from stt.utils import transcribe, upload_filename, upload_size, STT_MAX_BYTES
 
 stt_bp = Blueprint("stt", __name__)
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 @stt_bp.route("/speech_to_text", methods=["POST"])
 def speech_to_text():
 
+    if request.content_length and request.content_length > STT_MAX_BYTES:
+        return jsonify({"error": "Recording is too long"}), 413
+
     audio = request.files.get("audio")
 
     if not audio:
         return jsonify({"error": "No audio received"}), 400
 
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
-
-        # Save temporarily
-        temp_path = "temp_audio.wav"
-        audio.save(temp_path)
+    if upload_size(audio.stream) > STT_MAX_BYTES:
+        return jsonify({"error": "Recording is too long"}), 413
 
-        with open(temp_path, "rb") as file:
-            transcription = client.audio.transcriptions.create(
-                file=(temp_path, file.read()),
-                model="whisper-large-v3-turbo"
-            )
-
-        os.remove(temp_path)
+    try:
+        # Straight from the upload buffer: no temp file shared between requests
+        text = transcribe(audio.stream, upload_filename(audio.filename, audio.mimetype))
 
-        return jsonify({"text": transcription.text})
+        return jsonify({"text": text})
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+
+from groq import Groq
+from dotenv import load_dotenv
+
+from ai.groq import GROQ_BASE_URL
+from ai.metrics import Histogram, register
+
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+
+STT_MODEL = "whisper-large-v3-turbo"
+STT_TIMEOUT = float(os.getenv("STT_TIMEOUT", "30"))
+
+# Voice questions are a few seconds long; refuse anything far bigger
+STT_MAX_BYTES = int(os.getenv("STT_MAX_MB", "10")) * 1024 * 1024
+
+# Whisper picks the decoder from the file extension
+AUDIO_EXTENSIONS = {
+    "audio/webm": "webm",
+    "audio/ogg": "ogg",
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/mpeg": "mp3",
+    "audio/mp4": "m4a",
+    "audio/flac": "flac"
+}
+
+stt_latency = register(Histogram(
+    "stt_transcription_duration_seconds",
+    "Groq speech-to-text latency.",
+    labels=("outcome",)
+))
+
+
+# ---------------- SHARED CLIENT ----------------
+# One Groq client (and its connection pool) per worker process, rebuilt
+# after fork like the chat-completion session.
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+
+def get_stt_client():
+    global _client, _client_pid
+
+    pid = os.getpid()
+
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            # No SDK retries: the upload stream is read once and a retry
+            # would send an empty file
+            _client = Groq(
+                api_key=GROQ_API_KEY,
+                base_url=GROQ_BASE_URL,
+                timeout=STT_TIMEOUT,
+                max_retries=0
+            )
+            _client_pid = pid
+
+        return _client
+
+
+def upload_filename(filename, mimetype):
+    """
+    A filename whose extension matches the recording's format.
+    """
+    if filename and "." in filename:
+        return filename
+
+    extension = AUDIO_EXTENSIONS.get((mimetype or "").split(";")[0].strip(), "wav")
+    return f"audio.{extension}"
+
+
+def upload_size(stream):
+    # Size of an upload already buffered by the WSGI layer, without reading it
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+
+    return size
+
+
+def transcribe(stream, filename):
+    """
+    Text spoken in an audio file object; it is sent as-is, not copied.
+    """
+    started = time.monotonic()
+    outcome = "error"
+
+    try:
+        transcription = get_stt_client().audio.transcriptions.create(
+            file=(filename, stream),
+            model=STT_MODEL
+        )
+        outcome = "ok"
+
+    finally:
+        stt_latency.observe(time.monotonic() - started, outcome=outcome)
+
+    return transcription.text
@@ -0,0 +1,94 @@
+"""
+The map phase of a long pasted lesson against the default rate limiter
+(local buckets, as used without an app context).
+"""
+import threading
+import time
+
+import pytest
+
+import ai.groq as groq
+from ai import mapreduce
+from ai.groq import request_cost, BUSY_REPLY
+from ai.ratelimit import rate_limiter, GROQ_DEFAULT_TPM
+from ai.router import model_router
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def json(self):
+        return {"choices": [{"message": {"content": "partial notes"}}], "usage": {}}
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def post(self, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+
+        return FakeResponse()
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.setattr("ai.ratelimit.GROQ_RATE_LIMIT_ENABLED", True)
+
+    # Fresh, full default buckets for every test
+    monkeypatch.setattr(rate_limiter, "_local", {})
+
+    session = FakeSession()
+    monkeypatch.setattr(groq, "get_http_session", lambda: session)
+    return session
+
+
+def _chunks(words):
+    part = "The cell is the basic unit of life and every organism is made of cells. " * words
+    return [f"Part {index}\n{part}" for index in range(1, 9)]
+
+
+def test_chunks_within_budget_are_paced(upstream):
+    # A little over one bucket, admitted well before the deadline
+    chunks = _chunks(10)
+    map_deadline = 45 * mapreduce.MAP_DEADLINE_SHARE
+
+    started = time.monotonic()
+    partials, error = mapreduce._map(chunks, "board", "", 320, "free", map_deadline, "notes.paste")
+
+    assert error is None
+    assert partials == ["partial notes"] * 8
+    assert upstream.calls == 8
+    assert time.monotonic() - started < map_deadline
+
+
+def test_oversized_phase_leaves_limiter_to_others(upstream):
+    chunks = _chunks(100)
+    max_tokens = 320
+    map_deadline = 45 * mapreduce.MAP_DEADLINE_SHARE
+
+    # The phase needs more than the bucket can admit before the deadline
+    costs = [
+        request_cost(mapreduce.map_prompt(chunk, "board", index, 8, "")[0], max_tokens)
+        for index, chunk in enumerate(chunks, start=1)
+    ]
+    assert sum(costs) > GROQ_DEFAULT_TPM + map_deadline * GROQ_DEFAULT_TPM / 60
+
+    started = time.monotonic()
+    partials, error = mapreduce._map(chunks, "board", "", max_tokens, "free", map_deadline, "notes.paste")
+
+    assert error == BUSY_REPLY
+    assert upstream.calls == 0
+    assert time.monotonic() - started < 1
+
+    # Nothing was admitted for the paste: other callers still get through at once
+    model = model_router.primary("notes.paste.map", "free")
+    assert rate_limiter.acquire(model, 500, timeout=0)
@@ -1,17 +1,24 @@
-from flask import Blueprint, render_template, request, jsonify, session 
+from flask import Blueprint, render_template, request, jsonify, session, Response, stream_with_context
 from ai.notes import generate_notes_with_groq
+import base64
+import json
 
-from PIL import Image
-import pytesseract
 from flask import current_app
 from utils.db_helpers import get_user_plan, is_admin
+from utils.tutor_store import (
+    get_tutor_session, end_tutor_session, load_history,
+    last_explanation, add_message, set_topic
+)
+from ai.groq import is_error_reply, is_error_chunk
+from ai.summarizer import schedule_summary
+from jobs.queue import wants_async, enqueue, accepted
+from utils.quota import reserve
 
 # ----- IMPORTANT: Change this to your real DB import -----
-from models_pg import StudentProgress, TutorMessage, db
-from datetime import date
-
-
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from models_pg import StudentProgress, db
+from utils.student_profile import memory_text as student_memory, record_topic
+from ocr.engine import extract_text, pack_uploads, OCRError
+from voice.utils import SpeechPipeline, is_configured as voice_configured
 
 
 tutor_bp = Blueprint("tutor", __name__)
@@ -32,10 +39,8 @@ def pause_explanation():
 # ---- CLEAR CHAT ----
 @tutor_bp.route("/tutor/clear")
 def clear_chat():
-    session["chat_history"] = []
-    session["current_topic"] = ""
+    end_tutor_session()
     session["paused_explanation"] = False
-    session["last_explanation"] = ""
     return "cleared"
 
 # -------- SAVE STUDENT PROGRESS FUNCTION --------
@@ -53,14 +58,157 @@ def save_progress(user_id, topic, question, language):
     db.session.add(progress)
     db.session.commit()
 
+    record_topic(user_id, topic, language)
+
+# -------- ANSWER AS JSON OR AS A TOKEN STREAM --------
+def tutor_reply(prompt, history, stream, on_done, log_message, call_site="tutor", on_fail=None, voice=None):
+    """
+    Generate a tutor answer and hand the full text to on_done.
+
+    Streamed replies send headers before generation finishes, so on_done
+    must only write to the database, never to the cookie session.
+    With a voice, the answer is streamed together with its speech.
+    """
+    try:
+        result = generate_notes_with_groq(
+            lesson=prompt,
+            mode="tutor",
+            history=history,
+            stream=stream or bool(voice),
+            deadline=40,
+            call_site=call_site
+        )
+    except Exception:
+        current_app.logger.exception(log_message)
+
+        if on_fail:
+            on_fail()
+
+        return jsonify({"answer": "Tutor is temporarily unavailable."}), 500
+
+    if voice:
+        return speech_reply(result, on_done, voice, on_fail=on_fail)
+
+    if not stream:
+        on_done(result)
+        return jsonify({"answer": result})
+
+    def generate():
+        parts = []
+        failed = False
+        finished = False
+
+        try:
+            for chunk in result:
+                failed = failed or is_error_chunk(chunk)
+                parts.append(chunk)
+                yield chunk
+
+            if not failed:
+                on_done("".join(parts))
+                finished = True
+
+        finally:
+            # Failed, cut-off or abandoned answers are not remembered and cost no quota
+            if not finished and on_fail:
+                on_fail()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+# -------- ANSWER AND SPEECH IN ONE STREAM --------
+def speech_reply(chunks, on_done, voice_name, on_fail=None):
+    """
+    NDJSON events: answer text as it is generated, interleaved with MP3
+    audio (base64) for each finished sentence, in answer order. Speech
+    starts after the first sentence instead of after the whole answer.
+    """
+    pipeline = SpeechPipeline(voice_name) if voice_configured() else None
+
+    def event(kind, **data):
+        return json.dumps({"type": kind, **data}, ensure_ascii=False) + "\n"
+
+    def audio_events(segments):
+        for text, audio in segments:
+            if audio:
+                yield event("audio", text=text, audio=base64.b64encode(audio).decode("ascii"))
+
+    def generate():
+        parts = []
+        failed = False
+        finished = False
+
+        try:
+            for chunk in chunks:
+                failed = failed or is_error_chunk(chunk)
+                parts.append(chunk)
+                yield event("text", text=chunk)
+
+                if pipeline:
+                    yield from audio_events(pipeline.feed(chunk))
+
+            if not failed:
+                on_done("".join(parts))
+                finished = True
+
+            if pipeline:
+                yield from audio_events(pipeline.finish())
+
+            yield event("done")
+
+        finally:
+            # Student left or generation failed: drop queued sentences
+            if pipeline:
+                pipeline.cancel()
+
+            # An answer that was never remembered costs no quota
+            if not finished and on_fail:
+                on_fail()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+# Same defaults as the voice selector on the tutor page (female voices)
+DEFAULT_VOICES = {
+    "en": "en-IN-Neural2-A",
+    "hi": "hi-IN-Neural2-A",
+    "kn": "kn-IN-Standard-A"
+}
+
+
+@tutor_bp.route("/tutor/ask_voice", methods=["POST"])
+def ask_tutor_voice():
+    """
+    /tutor/ask with the answer read aloud as it is generated.
+    """
+    data = request.json or {}
+    voice = data.get("voice") or DEFAULT_VOICES.get(data.get("language"), DEFAULT_VOICES["en"])
+    return ask_tutor(voice=voice)
+
+
 @tutor_bp.route("/tutor/ask", methods=["POST"])
-def ask_tutor():
+def ask_tutor(voice=None):
 
     data = request.json or {}
 
     question = data.get("question", "").strip()
     language = data.get("language", "en")
     input_type = data.get("input_type", "question")
+    stream = bool(data.get("stream"))
 
     if not question:
         return jsonify({"answer": "Please ask a valid question."})
@@ -70,23 +218,15 @@ def ask_tutor():
 
     plan = get_user_plan(user_id)
 
-    # ---------- DAILY FREE LIMIT (10) ----------
-    if plan == "free" and not is_admin():
-        current_app.logger.info(
-            "Tutor free-limit check for user_id=%s plan=%s",
-            user_id,
-            plan
-        )
+    # ---------- DAILY FREE LIMIT (atomic; refunded if the AI fails) ----------
+    reservation = reserve(user_id, "tutor", limited=plan == "free" and not is_admin())
 
-        today_count = TutorMessage.query.filter(
-            TutorMessage.user_id == user_id,
-            TutorMessage.created >= date.today()
-        ).count()
+    if reservation is None:
+        current_app.logger.info("Tutor free limit reached for user_id=%s", user_id)
 
-        if today_count >= 10:
-            return jsonify({
-                "answer": "Daily free limit reached (10). Upgrade to Pro for unlimited Tutor access."
-            }), 403
+        return jsonify({
+            "answer": "Daily free limit reached (10). Upgrade to Pro for unlimited Tutor access."
+        }), 403
 
     # ----- LANGUAGE HANDLING -----
     if language == "hi":
@@ -96,26 +236,40 @@ def ask_tutor():
     else:
         lang_prompt = "Reply ONLY in simple English."
 
-    # ----- SESSION INIT -----
-    session.setdefault("chat_history", [])
-    session.setdefault("current_topic", "")
+    # ----- CONVERSATION (stored server-side, cookie holds only its id) -----
     session.setdefault("paused_explanation", False)
-    session.setdefault("last_explanation", "")
 
-    # ----- LOAD STUDENT MEMORY -----
-    past = StudentProgress.query.filter_by(user_id=user_id).all()
+    tutor_session = get_tutor_session(user_id)
+    history = load_history(tutor_session)
+
+    add_message(tutor_session, "user", question)
 
-    memory_text = ""
-    for p in past[-5:]:
-        memory_text += f"Previously studied: {p.topic}\n"
+    def remember(answer):
+        # Error replies are not part of the lesson and cost no quota
+        if is_error_reply(answer):
+            reservation.refund()
+            return False
+
+        add_message(tutor_session, "assistant", answer)
+        schedule_summary("tutor", tutor_session.id)
+        return True
+
+    # ----- LOAD STUDENT MEMORY -----
+    # Precomputed recent-topics profile (cached), not the full history
+    memory_text = student_memory(user_id)
 
     # --------------------------------------------------
     # CONTINUE COMMAND
     # --------------------------------------------------
     if question.lower() == "continue":
 
-        topic = session.get("current_topic", "")
-        last = session.get("last_explanation", "")
+        topic = tutor_session.title or ""
+        last = last_explanation(tutor_session.id)
+
+        session["paused_explanation"] = False
+
+        # The prompt already quotes the last explanation in full
+        history = [turn for turn in history if turn["content"] != last]
 
         resume_prompt = f"""
 {lang_prompt}
@@ -141,21 +295,16 @@ STRICT RULES:
 End with one small checking question.
 """
 
-        try:
-            answer = generate_notes_with_groq(
-                lesson=resume_prompt,
-                mode="tutor",
-                history=session["chat_history"]
-            )
-        except Exception:
-            current_app.logger.exception("Tutor continue AI failed")
-            return jsonify({"answer": "Tutor is temporarily unavailable."}), 500
-
-        session["paused_explanation"] = False
-        session["chat_history"].append({"role": "assistant", "content": answer})
-        session["last_explanation"] = answer
-
-        return jsonify({"answer": answer})
+        return tutor_reply(
+            resume_prompt,
+            history,
+            stream,
+            remember,
+            "Tutor continue AI failed",
+            call_site="tutor.continue",
+            on_fail=reservation.refund,
+            voice=voice
+        )
 
     # --------------------------------------------------
     # DOUBT MODE
@@ -169,7 +318,7 @@ STUDENT MEMORY:
 {memory_text}
 
 You were explaining this topic:
-{session.get('current_topic')}
+{tutor_session.title}
 
 Student doubt:
 {question}
@@ -186,19 +335,16 @@ At the END of your answer ALWAYS ask exactly this:
 "Did that clear your doubt? Shall I continue from where we left off?"
 """
 
-        try:
-            answer = generate_notes_with_groq(
-                lesson=doubt_prompt,
-                mode="tutor",
-                history=session["chat_history"]
-            )
-        except Exception:
-            current_app.logger.exception("Tutor doubt AI failed")
-            return jsonify({"answer": "Tutor is temporarily unavailable."}), 500
-
-        session["chat_history"].append({"role": "assistant", "content": answer})
-
-        return jsonify({"answer": answer})
+        return tutor_reply(
+            doubt_prompt,
+            history,
+            stream,
+            remember,
+            "Tutor doubt AI failed",
+            call_site="tutor.doubt",
+            on_fail=reservation.refund,
+            voice=voice
+        )
 
     # --------------------------------------------------
     # FULL LESSON PASTE
@@ -207,9 +353,8 @@ At the END of your answer ALWAYS ask exactly this:
 
         clean_topic = question[:120]
 
-        session["current_topic"] = clean_topic
+        set_topic(tutor_session, clean_topic)
         session["paused_explanation"] = False
-        session["last_explanation"] = ""
 
         lesson_prompt = f"""
 {lang_prompt}
@@ -231,31 +376,28 @@ LESSON:
 {question}
 """
 
-        try:
-            answer = generate_notes_with_groq(
-                lesson=lesson_prompt,
-                mode="tutor",
-                history=session["chat_history"]
-            )
-        except Exception:
-            current_app.logger.exception("Tutor lesson AI failed")
-            return jsonify({"answer": "Tutor is temporarily unavailable."}), 500
-
-        session["chat_history"].append({"role": "assistant", "content": answer})
-        session["last_explanation"] = answer
-
-        save_progress(user_id, clean_topic, question, language)
-
-        return jsonify({"answer": answer})
+        def finish_lesson(answer):
+            if remember(answer):
+                save_progress(user_id, clean_topic, question, language)
+
+        return tutor_reply(
+            lesson_prompt,
+            history,
+            stream,
+            finish_lesson,
+            "Tutor lesson AI failed",
+            call_site="tutor.lesson",
+            on_fail=reservation.refund,
+            voice=voice
+        )
 
     # --------------------------------------------------
     # NORMAL QUESTION (NEW TOPIC)
     # --------------------------------------------------
     clean_topic = question.strip()
 
-    session["current_topic"] = clean_topic[:120]
+    set_topic(tutor_session, clean_topic)
     session["paused_explanation"] = False
-    session["last_explanation"] = ""
 
     normal_prompt = f"""
 {lang_prompt}
@@ -273,60 +415,72 @@ At the end ask:
 "Did you understand? Shall I explain differently?"
 """
 
-    try:
-        answer = generate_notes_with_groq(
-            lesson=normal_prompt,
-            mode="tutor",
-            history=session["chat_history"]
-        )
-    except Exception:
-        current_app.logger.exception("Tutor normal AI failed")
-        return jsonify({"answer": "Tutor is temporarily unavailable."}), 500
+    def finish_normal(answer):
+        if remember(answer):
+            save_progress(user_id, clean_topic[:120], question, language)
+
+    return tutor_reply(
+        normal_prompt,
+        history,
+        stream,
+        finish_normal,
+        "Tutor normal AI failed",
+        call_site="tutor.question",
+        on_fail=reservation.refund,
+        voice=voice
+    )
 
-    session["chat_history"].append({"role": "assistant", "content": answer})
-    session["last_explanation"] = answer
 
-    save_progress(user_id, clean_topic[:120], question, language)
+# -------- IMAGE OCR ANALYSIS --------
+def image_explain_prompt(extracted_text):
+    return f"""
+The student uploaded an image containing this text:
 
-    return jsonify({"answer": answer})
+{extracted_text}
+
+Explain it like a friendly teacher:
+- In simple steps
+- With examples
+- In easy language
+- Ask one small question at the end
+"""
 
 
-# -------- IMAGE OCR ANALYSIS --------
 @tutor_bp.route("/tutor/analyze_image", methods=["POST"])
 def analyze_image():
 
     if "image" not in request.files:
         return jsonify({"answer": "No image uploaded."})
 
-    image_file = request.files["image"]
+    # Photos and/or PDFs; every page is read, in upload order
+    uploads = [file.read() for file in request.files.getlist("image")]
 
-    try:
-        img = Image.open(image_file)
+    # Background processing needs a signed-in owner to poll the result
+    if wants_async() and "user_id" in session:
+        job = enqueue(
+            "tutor.image", {"bundle": len(uploads) > 1}, user_id=session["user_id"],
+            input_blob=pack_uploads(uploads) if len(uploads) > 1 else uploads[0]
+        )
+        return accepted(job)
 
-        extracted_text = pytesseract.image_to_string(img, lang="eng")
+    try:
+        extracted_text = extract_text(uploads)
 
         if not extracted_text.strip():
             return jsonify({"answer": "Could not detect readable text in the image."})
 
-        prompt = f"""
-The student uploaded an image containing this text:
-
-{extracted_text}
-
-Explain it like a friendly teacher:
-- In simple steps
-- With examples
-- In easy language
-- Ask one small question at the end
-"""
-
         answer = generate_notes_with_groq(
-            lesson=prompt,
-            mode="tutor"
+            lesson=image_explain_prompt(extracted_text),
+            mode="tutor",
+            deadline=40,
+            call_site="tutor.image"
         )
 
         return jsonify({"answer": answer})
 
+    except OCRError as e:
+        return jsonify({"answer": str(e)})
+
     except Exception as e:
         return jsonify({"answer": "Error analyzing image. Please try a clearer image."})
 
@@ -356,9 +510,9 @@ def progress_api():
 
 @tutor_bp.route("/tutor/reset_topic", methods=["POST"])
 def reset_topic():
-    session["current_topic"] = ""
+    # Topic and last explanation live in the conversation; start a fresh one
+    end_tutor_session()
     session["paused_explanation"] = False
-    session["last_explanation"] = ""
     return "reset"
 
 @tutor_bp.route("/tutor/get_username")
@@ -1,7 +1,8 @@
-from models_pg import User, Note
-from datetime import date
+from models_pg import User
 from flask import session
 
+from utils.quota import used_today, total_notes
+
 
 def get_user_plan(user_id):
     """
@@ -51,17 +52,9 @@ def get_usage(user_id):
             "admin": True
         }
 
-    today_count = Note.query.filter_by(
-        user_id=user_id,
-        created=date.today()
-    ).count()
-
-    total_count = Note.query.filter_by(
-        user_id=user_id
-    ).count()
-
+    # Counter row lookup + cached lifetime count instead of two COUNT(*)s
     return {
-        "today": today_count,
-        "total": total_count,
+        "today": used_today(user_id, "notes"),
+        "total": total_notes(user_id),
         "admin": False
     }
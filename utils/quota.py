@@ -0,0 +1,122 @@
+import os
+from datetime import date
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from models_pg import db, UsageCounter, Note
+from ai.cache import LRUCache
+
+
+# ---------------- DAILY FREE-PLAN LIMITS ----------------
+
+FREE_LIMITS = {
+    "notes": int(os.getenv("FREE_NOTES_PER_DAY", "5")),
+    "chat": int(os.getenv("FREE_CHATS_PER_DAY", "10")),
+    "tutor": int(os.getenv("FREE_TUTOR_PER_DAY", "10"))
+}
+
+# Read-only displays (dashboard usage) may lag this many seconds
+USAGE_CACHE_TTL = int(os.getenv("USAGE_CACHE_TTL", "60"))
+
+_usage = LRUCache(4096, USAGE_CACHE_TTL)
+
+
+class Reservation:
+    """
+    One unit of a user's daily quota, taken before the work starts.
+    Call refund() if the work failed so the user is not charged.
+    """
+
+    def __init__(self, user_id, feature, day):
+        self.user_id = user_id
+        self.feature = feature
+        self.day = day
+        self.refunded = False
+
+    def refund(self):
+        if self.refunded:
+            return
+
+        self.refunded = True
+
+        UsageCounter.query.filter_by(
+            user_id=self.user_id,
+            feature=self.feature,
+            day=self.day
+        ).update({
+            "used": func.greatest(UsageCounter.used - 1, 0)
+        }, synchronize_session=False)
+        db.session.commit()
+
+        _usage.pop((self.user_id, self.feature))
+
+    def to_dict(self):
+        # For handing the reservation to a background job
+        return {"user_id": self.user_id, "feature": self.feature, "day": self.day.isoformat()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["user_id"], data["feature"], date.fromisoformat(data["day"]))
+
+
+def reserve(user_id, feature, limited=True):
+    """
+    Atomically take one unit of today's quota.
+    Returns a Reservation, or None when the daily limit is reached.
+    Unlimited users (limited=False) are still counted for usage display.
+    """
+    today = date.today()
+    limit = FREE_LIMITS[feature]
+
+    if limited and limit <= 0:
+        return None
+
+    stmt = insert(UsageCounter).values(user_id=user_id, feature=feature, day=today, used=1)
+
+    # The WHERE makes the increment a no-op (no row returned) at the limit,
+    # so concurrent requests cannot race past it
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "feature", "day"],
+        set_={"used": UsageCounter.used + 1},
+        where=(UsageCounter.used < limit) if limited else None
+    ).returning(UsageCounter.used)
+
+    used = db.session.execute(stmt).scalar()
+    db.session.commit()
+
+    _usage.pop((user_id, feature))
+
+    if used is None or (limited and used > limit):
+        return None
+
+    return Reservation(user_id, feature, today)
+
+
+def used_today(user_id, feature):
+    """
+    Today's count for display; cached briefly, one primary-key lookup.
+    """
+    key = (user_id, feature)
+    used = _usage.get(key)
+
+    if used is None:
+        row = db.session.get(UsageCounter, (user_id, feature, date.today()))
+        used = row.used if row else 0
+        _usage.put(key, used)
+
+    return used
+
+
+def total_notes(user_id):
+    """
+    Lifetime note count for display, cached briefly.
+    """
+    key = (user_id, "notes_total")
+    total = _usage.get(key)
+
+    if total is None:
+        total = Note.query.filter_by(user_id=user_id).count()
+        _usage.put(key, total)
+
+    return total
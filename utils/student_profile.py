@@ -0,0 +1,120 @@
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import insert
+
+from models_pg import db, StudentProgress, StudentProfile
+from ai.cache import LRUCache
+
+
+# Distinct recent topics kept per student
+PROFILE_TOPICS = int(os.getenv("PROFILE_TOPICS", "5"))
+
+# Other workers may serve a profile this stale; writes here invalidate
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "2000"))
+
+_profiles = LRUCache(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL)
+
+
+def _merge(entries, entry):
+    """
+    Put entry first and drop older entries for the same topic.
+    """
+    key = entry["topic"].strip().casefold()
+    rest = [e for e in entries if e["topic"].strip().casefold() != key]
+
+    return ([entry] + rest)[:PROFILE_TOPICS]
+
+
+def _entry(topic, language, difficulty, at):
+    return {
+        "topic": topic or "",
+        "language": language or "en",
+        "difficulty": difficulty or "normal",
+        "at": at.isoformat() if at else None
+    }
+
+
+def _build_from_history(user_id):
+    # One-time backfill for students who studied before profiles existed
+    rows = (
+        StudentProgress.query
+        .filter_by(user_id=user_id)
+        .order_by(StudentProgress.created_at.desc())
+        .limit(PROFILE_TOPICS * 10)
+        .all()
+    )
+
+    entries = []
+
+    for row in reversed(rows):
+        entries = _merge(entries, _entry(row.topic, row.language, row.difficulty, row.created_at))
+
+    db.session.execute(
+        insert(StudentProfile)
+        .values(user_id=user_id, recent_topics=json.dumps(entries), updated_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["user_id"])
+    )
+    db.session.commit()
+
+    return entries
+
+
+def get_recent_topics(user_id):
+    """
+    The student's last PROFILE_TOPICS distinct topics, newest first.
+    """
+    entries = _profiles.get(user_id)
+
+    if entries is not None:
+        return entries
+
+    profile = db.session.get(StudentProfile, user_id)
+
+    if profile:
+        entries = json.loads(profile.recent_topics or "[]")
+    else:
+        entries = _build_from_history(user_id)
+
+    _profiles.put(user_id, entries)
+    return entries
+
+
+def record_topic(user_id, topic, language, difficulty="normal"):
+    """
+    Fold a newly studied topic into the profile (call after saving
+    StudentProgress). The row lock keeps concurrent tabs from losing updates.
+    """
+    if not db.session.get(StudentProfile, user_id):
+        # Backfill includes the row just saved; the merge below is idempotent
+        _build_from_history(user_id)
+
+    profile = (
+        StudentProfile.query
+        .filter_by(user_id=user_id)
+        .with_for_update()
+        .first()
+    )
+
+    entries = _merge(
+        json.loads(profile.recent_topics or "[]"),
+        _entry(topic, language, difficulty, datetime.utcnow())
+    )
+
+    profile.recent_topics = json.dumps(entries)
+    profile.updated_at = datetime.utcnow()
+    db.session.commit()
+
+    _profiles.put(user_id, entries)
+
+
+def memory_text(user_id):
+    """
+    "Previously studied" lines for tutor prompts, oldest first.
+    """
+    return "".join(
+        f"Previously studied: {entry['topic']}\n"
+        for entry in reversed(get_recent_topics(user_id))
+    )
@@ -0,0 +1,100 @@
+import os
+
+from flask import session
+
+from models_pg import db, TutorSession, TutorMessage
+from ai.summarizer import summary_message
+
+
+# Turns loaded from the database per request; older ones stay on disk
+TUTOR_HISTORY_TURNS = int(os.getenv("TUTOR_HISTORY_TURNS", "10"))
+
+# Cookie keys from before conversations lived in the database
+LEGACY_SESSION_KEYS = ("chat_history", "last_explanation", "current_topic")
+
+
+def get_tutor_session(user_id):
+    """
+    Current tutor conversation for this browser, created on first use.
+    The cookie only carries its id.
+    """
+    for key in LEGACY_SESSION_KEYS:
+        session.pop(key, None)
+
+    session_id = session.get("tutor_session_id")
+
+    if session_id:
+        tutor_session = TutorSession.query.filter_by(id=session_id, user_id=user_id).first()
+
+        if tutor_session:
+            return tutor_session
+
+    tutor_session = TutorSession(user_id=user_id, title="")
+
+    db.session.add(tutor_session)
+    db.session.commit()
+
+    session["tutor_session_id"] = tutor_session.id
+
+    return tutor_session
+
+
+def end_tutor_session():
+    """
+    Forget the current conversation; the next question starts a new one.
+    """
+    session.pop("tutor_session_id", None)
+
+    for key in LEGACY_SESSION_KEYS:
+        session.pop(key, None)
+
+
+def load_history(tutor_session, limit=TUTOR_HISTORY_TURNS):
+    """
+    Running summary plus the messages it does not cover yet (at most
+    `limit`, oldest first), in chat-message format.
+    """
+    rows = (
+        TutorMessage.query
+        .filter(
+            TutorMessage.session_id == tutor_session.id,
+            TutorMessage.id > tutor_session.summary_upto
+        )
+        .order_by(TutorMessage.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+    history = [{"role": row.role, "content": row.message} for row in reversed(rows)]
+    summary = summary_message(tutor_session.summary)
+
+    return ([summary] if summary else []) + history
+
+
+def last_explanation(tutor_session_id):
+    """
+    Latest assistant message in the conversation, or "".
+    """
+    row = (
+        TutorMessage.query
+        .filter_by(session_id=tutor_session_id, role="assistant")
+        .order_by(TutorMessage.id.desc())
+        .first()
+    )
+
+    return row.message if row else ""
+
+
+def add_message(tutor_session, role, message):
+    db.session.add(TutorMessage(
+        user_id=tutor_session.user_id,
+        session_id=tutor_session.id,
+        role=role,
+        message=message
+    ))
+    db.session.commit()
+
+
+def set_topic(tutor_session, topic):
+    tutor_session.title = topic[:120]
+    db.session.commit()
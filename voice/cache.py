@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# ---------------- SETTINGS ----------------
+# Synthesized MP3s are stored on local disk under a content address, so
+# every worker on the host can replay a note or tutor answer without
+# calling Google again. The directory is bounded by total size; the
+# least recently played files go first (mtime doubles as "last used").
+
+TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "genias-tts"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+# Re-check the directory size once every N stores per worker
+PRUNE_EVERY = 25
+
+
+def audio_key(text, voice_name, speaking_rate):
+    """
+    Content address (and strong ETag) for one synthesis request.
+    """
+    raw = f"{voice_name}\n{speaking_rate:.3f}\n{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stores = 0
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "errors": 0
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def path_for(self, key):
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def get(self, key):
+        """
+        Path of the cached MP3, or None.
+        """
+        if not TTS_CACHE_ENABLED:
+            return None
+
+        path = self.path_for(key)
+
+        try:
+            # Mark as recently used for eviction
+            os.utime(path)
+        except OSError:
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        return path
+
+    def put(self, key, audio):
+        """
+        Store audio; returns its path, or None if it could not be written.
+        """
+        if not TTS_CACHE_ENABLED or not audio:
+            return None
+
+        path = self.path_for(key)
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # Write then rename so readers never see a partial file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+
+            with os.fdopen(fd, "wb") as file:
+                file.write(audio)
+
+            os.replace(temp_path, path)
+
+        except OSError:
+            self._count("errors")
+            logger.exception("TTS cache write failed")
+            return None
+
+        self._count("stores")
+
+        with self._lock:
+            self._stores += 1
+            prune = self._stores % PRUNE_EVERY == 0
+
+        if prune:
+            self.prune()
+
+        return path
+
+    def prune(self):
+        """
+        Delete least recently used files until the cache fits its budget.
+        """
+        files, total = [], 0
+
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                # Leftovers of writes that died half-way
+                if name.endswith(".part") and stat.st_mtime < time.time() - 3600:
+                    self._remove(path)
+                    continue
+
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        files.sort()
+
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+
+            if self._remove(path):
+                total -= size
+                self._count("evictions")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+
+tts_cache = AudioCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
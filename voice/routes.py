@@ -1,108 +1,116 @@
-from flask import Blueprint, request, Response
+from flask import Blueprint, request, Response, send_file, stream_with_context
 import os
-import json
-import tempfile
-from dotenv import load_dotenv
 
-from google.cloud import texttospeech
+from voice.utils import (
+    is_configured, synthesize, split_for_tts, synthesize_chunks,
+    TTS_MAX_CHARS, TTS_SPEAKING_RATE
+)
+from voice.cache import tts_cache, audio_key
 
-load_dotenv()
+# How long browsers may replay audio before revalidating with the ETag
+AUDIO_MAX_AGE = int(os.getenv("AUDIO_MAX_AGE", str(7 * 24 * 3600)))
 
 # ---- CREATE BLUEPRINT ----
 voice_bp = Blueprint("voice", __name__)
 
 # ---------------------------------------------------
-# LOAD GOOGLE TTS CREDENTIALS FROM ENV (RENDER SAFE)
+# HELPERS
 # ---------------------------------------------------
 
-tts_json = os.getenv("GOOGLE_TTS_JSON")
+def audio_response(response, key):
+    response.set_etag(key)
+    response.headers["Cache-Control"] = f"private, max-age={AUDIO_MAX_AGE}"
+    return response
 
-TEMP_CRED_PATH = None
 
-if tts_json:
-    try:
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix=".json"
-        )
-        temp_file.write(tts_json.encode("utf-8"))
-        temp_file.close()
-
-        TEMP_CRED_PATH = temp_file.name
-        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = TEMP_CRED_PATH
-
-        print("✅ Google TTS credentials loaded from env")
-
-    except Exception as e:
-        print("❌ Failed to write Google TTS credentials:", str(e))
-
-else:
-    print("⚠️ GOOGLE_TTS_JSON not set — voice disabled")
+def audio_file(path, key):
+    # Streamed by the WSGI server's file wrapper (sendfile), with Range support
+    response = send_file(path, mimetype="audio/mpeg", etag=key, conditional=True)
+    return audio_response(response, key)
 
 # ---------------------------------------------------
 # ROUTE
 # ---------------------------------------------------
 
-@voice_bp.route("/voice")
+@voice_bp.route("/voice", methods=["GET", "POST"])
 def voice():
 
-    text = request.args.get("text", "").strip()
-    voice_name = request.args.get("voice", "en-IN-Neural2-C")
+    # Long texts exceed the request-line limit in a URL; they come as JSON
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+    else:
+        data = request.args
+
+    text = (data.get("text") or "").strip()
+    voice_name = data.get("voice") or "en-IN-Neural2-C"
 
     if not text:
         return "No text provided", 400
 
-    # Limit length for Google API
-    MAX_LENGTH = 4500
-    if len(text) > MAX_LENGTH:
-        text = text[:MAX_LENGTH]
+    # Long texts are split below; this only bounds the cost of one request
+    if len(text) > TTS_MAX_CHARS:
+        text = text[:TTS_MAX_CHARS]
+
+    # The key hashes everything that shapes the audio, so it is a strong ETag
+    key = audio_key(text, voice_name, TTS_SPEAKING_RATE)
+
+    if key in request.if_none_match:
+        return audio_response(Response(status=304), key)
+
+    path = tts_cache.get(key)
+
+    if path:
+        return audio_file(path, key)
 
     # If credentials missing → fail cleanly
-    if not TEMP_CRED_PATH:
+    if not is_configured():
         return "Voice service not configured", 503
 
+    chunks = split_for_tts(text)
+
     try:
-        client = texttospeech.TextToSpeechClient()
-
-        synthesis_input = texttospeech.SynthesisInput(
-            text=text
-        )
-
-        # Language detection
-        if voice_name.startswith("hi-IN"):
-            language_code = "hi-IN"
-        elif voice_name.startswith("kn-IN"):
-            language_code = "kn-IN"
-        else:
-            language_code = "en-IN"
-
-        voice_params = texttospeech.VoiceSelectionParams(
-            language_code=language_code,
-            name=voice_name
-        )
-
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=0.96,
-            pitch=0.0,
-            volume_gain_db=0.0
-        )
-
-        response = client.synthesize_speech(
-            input=synthesis_input,
-            voice=voice_params,
-            audio_config=audio_config
-        )
-
-        return Response(
-            response.audio_content,
-            mimetype="audio/mpeg",
-            headers={
-                "Cache-Control": "no-cache",
-                "Content-Type": "audio/mpeg"
-            }
-        )
+        if len(chunks) <= 1:
+            audio = synthesize(text, voice_name, TTS_SPEAKING_RATE)
+            path = tts_cache.put(key, audio)
+
+            if path:
+                return audio_file(path, key)
+
+            return audio_response(Response(audio, mimetype="audio/mpeg"), key)
+
+        # Wait for the first sentence only, so failures still get a clean 500
+        stream = synthesize_chunks(chunks, voice_name, TTS_SPEAKING_RATE)
+        first = next(stream)
 
     except Exception as e:
         print("❌ TTS Error:", str(e))
         return f"Error generating voice: {str(e)}", 500
+
+    def generate():
+        parts = [first]
+        yield first
+
+        try:
+            for audio in stream:
+                parts.append(audio)
+                yield audio
+
+        except Exception as e:
+            # Headers are sent: abort the connection so nothing caches a cut-off file
+            print("❌ TTS Error:", str(e))
+            raise
+
+        finally:
+            stream.close()
+
+        tts_cache.put(key, b"".join(parts))
+
+    # No ETag here: the next play is served whole from the disk cache
+    return Response(
+        stream_with_context(generate()),
+        mimetype="audio/mpeg",
+        headers={
+            "Cache-Control": "no-store",
+            "X-Accel-Buffering": "no"
+        }
+    )
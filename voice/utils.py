@@ -0,0 +1,407 @@
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from google.cloud import texttospeech
+from google.auth.credentials import AnonymousCredentials
+
+from ai.metrics import Counter, Histogram, register
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------
+# LOAD GOOGLE TTS CREDENTIALS FROM ENV (RENDER SAFE)
+# ---------------------------------------------------
+
+tts_json = os.getenv("GOOGLE_TTS_JSON")
+
+TEMP_CRED_PATH = None
+
+if tts_json:
+    try:
+        temp_file = tempfile.NamedTemporaryFile(
+            delete=False,
+            suffix=".json"
+        )
+        temp_file.write(tts_json.encode("utf-8"))
+        temp_file.close()
+
+        TEMP_CRED_PATH = temp_file.name
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = TEMP_CRED_PATH
+
+        print("✅ Google TTS credentials loaded from env")
+
+    except Exception as e:
+        print("❌ Failed to write Google TTS credentials:", str(e))
+
+else:
+    print("⚠️ GOOGLE_TTS_JSON not set — voice disabled")
+
+# Optional REST endpoint override (e.g. http://127.0.0.1:8090 for the
+# load-test stand-in); no Google credentials are needed then
+TTS_API_ENDPOINT = os.getenv("TTS_API_ENDPOINT")
+
+# Open the channel and fetch an access token when a worker boots
+TTS_WARMUP = os.getenv("TTS_WARMUP", "true").lower() == "true"
+
+TTS_TIMEOUT = float(os.getenv("TTS_TIMEOUT", "15"))
+
+# Longest text read aloud in one request (split into chunks below)
+TTS_MAX_CHARS = int(os.getenv("TTS_MAX_CHARS", "20000"))
+
+# Google's limit is 5000 bytes of input per call. Smaller chunks mean more
+# parallelism; the first one is kept short so playback starts quickly.
+TTS_CHUNK_BYTES = int(os.getenv("TTS_CHUNK_BYTES", "1800"))
+TTS_FIRST_CHUNK_BYTES = int(os.getenv("TTS_FIRST_CHUNK_BYTES", "300"))
+TTS_API_MAX_BYTES = 4800
+
+# Chunks synthesized ahead of playback per request, and threads per worker
+TTS_PARALLEL = int(os.getenv("TTS_PARALLEL", "3"))
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "8"))
+
+TTS_SPEAKING_RATE = 0.96
+
+tts_latency = register(Histogram(
+    "tts_synthesis_duration_seconds",
+    "Google TTS synthesize_speech latency.",
+    labels=("language", "outcome")
+))
+
+tts_clients = register(Counter(
+    "tts_clients_created_total",
+    "TTS clients (gRPC channels) created by this worker."
+))
+
+
+def is_configured():
+    return bool(TEMP_CRED_PATH or TTS_API_ENDPOINT)
+
+
+def make_tts_client():
+    if TTS_API_ENDPOINT:
+        return texttospeech.TextToSpeechClient(
+            credentials=AnonymousCredentials(),
+            transport="rest",
+            client_options={"api_endpoint": TTS_API_ENDPOINT}
+        )
+
+    return texttospeech.TextToSpeechClient()
+
+
+# ---------------- SHARED CLIENT ----------------
+# One client (and gRPC channel) per worker process, reused by every
+# request thread. gRPC channels do not survive fork(), so a client
+# inherited from the gunicorn master is replaced in the child.
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+
+def get_tts_client():
+    global _client, _client_pid
+
+    pid = os.getpid()
+
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = make_tts_client()
+            _client_pid = pid
+            tts_clients.inc()
+
+        return _client
+
+
+def warm_up():
+    """
+    Create this worker's client and make one cheap call so the first
+    read-aloud does not pay for the channel and token.
+    """
+    if not TTS_WARMUP or not is_configured():
+        return
+
+    started = time.monotonic()
+
+    try:
+        get_tts_client().list_voices(language_code="en-IN", timeout=TTS_TIMEOUT)
+        logger.info("TTS client warmed up in %.2fs", time.monotonic() - started)
+    except Exception:
+        # Not fatal: the first request will retry on the same client
+        logger.warning("TTS warm-up failed", exc_info=True)
+
+
+def language_for_voice(voice_name):
+    # Language detection
+    if voice_name.startswith("hi-IN"):
+        return "hi-IN"
+    elif voice_name.startswith("kn-IN"):
+        return "kn-IN"
+
+    return "en-IN"
+
+
+def synthesize(text, voice_name, speaking_rate=TTS_SPEAKING_RATE):
+    """
+    MP3 bytes for text spoken by voice_name.
+    """
+    language_code = language_for_voice(voice_name)
+
+    synthesis_input = texttospeech.SynthesisInput(
+        text=text
+    )
+
+    voice_params = texttospeech.VoiceSelectionParams(
+        language_code=language_code,
+        name=voice_name
+    )
+
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding.MP3,
+        speaking_rate=speaking_rate,
+        pitch=0.0,
+        volume_gain_db=0.0
+    )
+
+    started = time.monotonic()
+    outcome = "error"
+
+    try:
+        response = get_tts_client().synthesize_speech(
+            input=synthesis_input,
+            voice=voice_params,
+            audio_config=audio_config,
+            timeout=TTS_TIMEOUT
+        )
+        outcome = "ok"
+
+    finally:
+        tts_latency.observe(time.monotonic() - started, language=language_code, outcome=outcome)
+
+    return response.audio_content
+
+
+# ---------------- CHUNKED SYNTHESIS ----------------
+
+SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+
+def _size(text):
+    return len(text.encode("utf-8"))
+
+
+def _hard_split(text, budget):
+    # A "sentence" over the API limit: cut at spaces, then anywhere
+    pieces, current = [], ""
+
+    for word in text.split(" "):
+        while _size(word) > budget:
+            cut = budget // 4 or 1
+            pieces.append(word[:cut])
+            word = word[cut:]
+
+        candidate = f"{current} {word}" if current else word
+
+        if _size(candidate) > budget and current:
+            pieces.append(current)
+            candidate = word
+
+        current = candidate
+
+    if current:
+        pieces.append(current)
+
+    return pieces
+
+
+def split_for_tts(text):
+    """
+    Split text at sentence boundaries into chunks under the API limit.
+    The first chunk is short so audio can start after one sentence.
+    """
+    sentences = []
+
+    for sentence in SENTENCE_END.split(text.strip()):
+        sentence = " ".join(sentence.split())
+
+        if not sentence:
+            continue
+
+        if _size(sentence) > TTS_API_MAX_BYTES:
+            sentences.extend(_hard_split(sentence, TTS_API_MAX_BYTES))
+        else:
+            sentences.append(sentence)
+
+    chunks, current = [], ""
+
+    for sentence in sentences:
+        budget = TTS_FIRST_CHUNK_BYTES if not chunks else TTS_CHUNK_BYTES
+        candidate = f"{current} {sentence}" if current else sentence
+
+        if current and _size(candidate) > budget:
+            chunks.append(current)
+            candidate = sentence
+
+        current = candidate
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    # Threads do not survive fork() either; same rule as the client
+    global _executor, _executor_pid
+
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+            _executor_pid = os.getpid()
+
+        return _executor
+
+
+def synthesize_chunks(chunks, voice_name, speaking_rate=TTS_SPEAKING_RATE):
+    """
+    Yield MP3 audio for each chunk, in order, synthesizing up to
+    TTS_PARALLEL chunks ahead. MP3 is a stream of frames, so the pieces
+    can be sent back to back. Closing the generator cancels the rest.
+    """
+    executor = _get_executor()
+    pending = deque()
+    remaining = iter(chunks)
+
+    def submit_next():
+        chunk = next(remaining, None)
+
+        if chunk is not None:
+            pending.append(executor.submit(synthesize, chunk, voice_name, speaking_rate))
+
+    for _ in range(max(1, TTS_PARALLEL)):
+        submit_next()
+
+    try:
+        while pending:
+            audio = pending.popleft().result(timeout=TTS_TIMEOUT * 2)
+            submit_next()
+            yield audio
+
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# ---------------- SPEECH WHILE GENERATING ----------------
+
+SPOKEN_BREAK = re.compile(r"(?<=[.!?।:])\s+|\n+")
+MARKDOWN_SYMBOLS = re.compile(r"[#*_`>]+")
+LIST_SYMBOLS = re.compile(r"[|•]+")
+
+
+def speakable(text):
+    # Same cleanup the tutor page applies before read-aloud
+    text = LIST_SYMBOLS.sub(" ", MARKDOWN_SYMBOLS.sub("", text))
+    return " ".join(text.split())
+
+
+class SpeechPipeline:
+    """
+    Feed a streamed answer in; completed sentences are synthesized in the
+    background while the rest is still generating. Audio comes back in
+    answer order as (segment text, MP3 bytes or None if it failed).
+    """
+
+    def __init__(self, voice_name, speaking_rate=TTS_SPEAKING_RATE):
+        self.voice_name = voice_name
+        self.speaking_rate = speaking_rate
+        self.executor = _get_executor()
+        self.buffer = ""
+        self.segment = ""
+        self.submitted = 0
+        self.pending = deque()
+
+    def _submit(self, text):
+        text = speakable(text)
+
+        if text:
+            self.submitted += 1
+            future = self.executor.submit(synthesize, text, self.voice_name, self.speaking_rate)
+            self.pending.append((text, future))
+
+    def _add_sentence(self, sentence):
+        self.segment = f"{self.segment} {sentence}" if self.segment else sentence
+
+        # The first sentence goes alone so the student hears it quickly
+        budget = TTS_FIRST_CHUNK_BYTES if self.submitted else 0
+
+        if _size(self.segment) >= budget:
+            if _size(self.segment) > TTS_API_MAX_BYTES:
+                pieces = _hard_split(self.segment, TTS_API_MAX_BYTES)
+            else:
+                pieces = [self.segment]
+
+            for piece in pieces:
+                self._submit(piece)
+
+            self.segment = ""
+
+    def _collect(self, block):
+        ready = []
+
+        while self.pending and (block or self.pending[0][1].done()):
+            text, future = self.pending.popleft()
+
+            try:
+                ready.append((text, future.result(timeout=TTS_TIMEOUT * 2)))
+            except Exception:
+                logger.warning("Sentence synthesis failed", exc_info=True)
+                ready.append((text, None))
+
+        return ready
+
+    def feed(self, text):
+        """
+        Add answer text; returns the audio segments already finished.
+        """
+        self.buffer += text
+        parts = SPOKEN_BREAK.split(self.buffer)
+        self.buffer = parts.pop()
+
+        for sentence in parts:
+            if sentence.strip():
+                self._add_sentence(sentence.strip())
+
+        return self._collect(block=False)
+
+    def finish(self):
+        """
+        Flush the last sentence and wait for every remaining segment.
+        """
+        tail = f"{self.segment} {self.buffer}".strip()
+        self.segment, self.buffer = "", ""
+
+        for piece in split_for_tts(tail) if tail else []:
+            self._submit(piece)
+
+        return self._collect(block=True)
+
+    def cancel(self):
+        for _, future in self.pending:
+            future.cancel()
+
+        self.pending.clear()